@@ -0,0 +1,94 @@
+"""Measures how fast a crowd of clients connects to a local TcpServer and the
+memory each client holds once connected.
+
+Every client gets its own TcpClient and connection, all of them started at
+once and left open until the last one is connected. The count is the first
+argument, 10000 by default, the open file limit is raised to fit it.
+
+"""
+
+import gc
+import sys
+import time
+import resource
+import tracemalloc
+
+import pyev
+
+sys.path.insert(0, '..')
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.server import TcpServer
+from whizzer.client import TcpClient
+
+
+COUNT = 10000
+
+
+def raise_limit(count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # a socket each side of every connection and some to spare
+    wanted = count * 2 + 64
+    if hard != resource.RLIM_INFINITY:
+        wanted = min(wanted, hard)
+    if soft == resource.RLIM_INFINITY or wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    limit = raise_limit(count)
+    if limit != resource.RLIM_INFINITY and limit < count * 2 + 64:
+        print("open file limit %d only fits %d connections" %
+              (limit, (limit - 64) // 2))
+        count = (limit - 64) // 2
+
+    loop = pyev.default_loop()
+    factory = ProtocolFactory()
+    factory.protocol = Protocol
+    server = TcpServer(loop, factory, "127.0.0.1", 0, backlog=4096,
+                       accept_batch=256)
+    server.start()
+    host, port = server.sock.getsockname()
+
+    state = {'connected': 0, 'failed': 0}
+
+    def connected(protocol):
+        state['connected'] += 1
+
+    def failed(reason):
+        state['failed'] += 1
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.time()
+
+    clients = []
+    for x in range(count):
+        client = TcpClient(loop, factory, host, port)
+        client.sigint_watcher.stop()
+        d = client.connect(30.0)
+        d.add_callbacks(connected, failed)
+        clients.append(client)
+
+    while state['connected'] + state['failed'] < count:
+        loop.start(pyev.EVRUN_ONCE)
+    elapsed = time.time() - started
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print("%d connected, %d failed in %.2f sec, %.0f connects per sec" %
+          (state['connected'], state['failed'], elapsed, count / elapsed))
+    print("%d bytes per connection, client and server side" % (used / count))
+
+    for client in clients:
+        if client.connection:
+            client.disconnect()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measures the memory held per idle server connection.
+
+Connections are made over socket pairs and handed to a server with
+add_connection, tracemalloc counts what the python objects cost. The compact
+run uses the classes as they are, the plain run uses subclasses with a
+__dict__ and an eagerly created write watcher as the classes used to have.
+
+"""
+
+import gc
+import sys
+import socket
+import tracemalloc
+
+import pyev
+
+sys.path.insert(0, '..')
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.server import UnixServer, Connection
+from whizzer.transport import SocketTransport
+import whizzer.server
+
+
+COUNT = 400
+
+
+class PlainProtocol(Protocol):
+    pass
+
+
+class PlainTransport(SocketTransport):
+    def __init__(self, *args, **kwargs):
+        SocketTransport.__init__(self, *args, **kwargs)
+        self._watch_writes()
+        self.write_watcher.stop()
+
+
+class PlainConnection(Connection):
+    pass
+
+
+def bench(loop, protocol, transport, connection):
+    factory = ProtocolFactory()
+    factory.protocol = protocol
+    whizzer.server.SocketTransport = transport
+    whizzer.server.Connection = connection
+    server = UnixServer(loop, factory, "memory_bench.sock")
+    pairs = [socket.socketpair() for x in range(COUNT)]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for ssock, csock in pairs:
+        server.add_connection(ssock, None)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    server.shutdown()
+    for ssock, csock in pairs:
+        csock.close()
+    return (after - before) / float(COUNT)
+
+
+def main():
+    loop = pyev.default_loop()
+    plain = bench(loop, PlainProtocol, PlainTransport, PlainConnection)
+    compact = bench(loop, Protocol, SocketTransport, Connection)
+    print("plain:   %8.1f bytes per idle connection" % plain)
+    print("compact: %8.1f bytes per idle connection" % compact)
+    print("saved:   %8.1f%%" % ((plain - compact) / plain * 100))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Request/response latency over loopback tcp with Nagle's algorithm on
+and off.
+
+Every request and response is written as a small header followed by a small
+body, much like the rpc protocols do. With Nagle enabled the body waits for
+the header to be acked which the other end delays.
+
+"""
+
+import sys
+import time
+
+import pyev
+
+sys.path.insert(0, '..')
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.server import TcpServer
+from whizzer.client import TcpClient
+from whizzer.sockopt import SocketOptions
+
+
+HEADER = b'\x00\x00\x00\x3c'
+BODY = b'x' * 60
+MESSAGE = len(HEADER) + len(BODY)
+ROUNDS = 200
+
+
+class Echo(Protocol):
+    def connection_made(self, address):
+        self.received = 0
+
+    def data(self, data):
+        self.received += len(data)
+        while self.received >= MESSAGE:
+            self.received -= MESSAGE
+            self.transport.write(HEADER)
+            self.transport.write(BODY)
+
+
+class Ping(Protocol):
+    def connection_made(self, address):
+        self.received = 0
+        self.rounds = 0
+        self.start = time.time()
+        self.send()
+
+    def send(self):
+        self.transport.write(HEADER)
+        self.transport.write(BODY)
+
+    def data(self, data):
+        self.received += len(data)
+        if self.received < MESSAGE:
+            return
+        self.received -= MESSAGE
+        self.rounds += 1
+        if self.rounds < ROUNDS:
+            self.send()
+        else:
+            self.elapsed = time.time() - self.start
+            self.loop.stop(pyev.EVBREAK_ALL)
+
+
+def bench(loop, port, nodelay):
+    options = SocketOptions(nodelay=nodelay)
+
+    sfactory = ProtocolFactory()
+    sfactory.protocol = Echo
+    server = TcpServer(loop, sfactory, "127.0.0.1", port, options=options)
+    server.start()
+
+    cfactory = ProtocolFactory()
+    cfactory.protocol = Ping
+    client = TcpClient(loop, cfactory, "127.0.0.1", port, options=options)
+    ping = client.connect().result()
+    loop.start()
+
+    client.disconnect()
+    server.shutdown()
+    return ping.elapsed / ROUNDS
+
+
+def main():
+    loop = pyev.default_loop()
+    for port, nodelay in ((2100, False), (2101, True)):
+        latency = bench(loop, port, nodelay)
+        print("nodelay %-5s: %8.1f usec per request/response" %
+              (nodelay, latency * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measures how many datagrams per second a UdpServer receives.
+
+A DatagramTransport on the same loop sends batches of small datagrams from an
+idle watcher while the server counts what arrives. Datagrams the kernel drops
+are counted as sent but not received.
+
+"""
+
+import sys
+import time
+import socket
+
+import pyev
+
+sys.path.insert(0, '..')
+
+from whizzer.protocol import DatagramProtocol, ProtocolFactory
+from whizzer.server import UdpServer
+from whizzer.transport import DatagramTransport, BufferOverflowError
+
+
+DURATION = 5.0
+BATCH = 64
+PAYLOAD = b'x' * 64
+
+
+class Counter(DatagramProtocol):
+    received = 0
+
+    def datagram_received(self, data, address):
+        self.received += 1
+
+
+class Sender(object):
+    def __init__(self, loop, address):
+        self.address = address
+        self.sent = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(address)
+        self.transport = DatagramTransport(loop, self.sock, None, None,
+                                           max_size=BATCH * len(PAYLOAD))
+        self.transport.start()
+        self.idle = pyev.Idle(loop, self.send)
+        self.idle.start()
+
+    def send(self, watcher, events):
+        if self.transport.write_buffer:
+            return
+        try:
+            for x in range(BATCH):
+                self.transport.write(PAYLOAD)
+                self.sent += 1
+        except BufferOverflowError:
+            pass
+
+
+def stop(watcher, events):
+    watcher.loop.stop(pyev.EVBREAK_ALL)
+
+
+def main():
+    loop = pyev.default_loop()
+
+    factory = ProtocolFactory()
+    factory.protocol = Counter
+    server = UdpServer(loop, factory, "127.0.0.1", 0)
+    server.start()
+
+    sender = Sender(loop, server.sock.getsockname())
+    timer = pyev.Timer(DURATION, 0.0, loop, stop)
+    timer.start()
+
+    before = time.time()
+    loop.start()
+    elapsed = time.time() - before
+
+    print("sent:     %10.0f datagrams per second" % (sender.sent / elapsed))
+    print("received: %10.0f datagrams per second" %
+          (server.protocol.received / elapsed))
+
+if __name__ == "__main__":
+    main()
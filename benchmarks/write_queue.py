@@ -0,0 +1,63 @@
+"""Measures the cost of flushing a backed up SocketTransport.
+
+The peer reads a fixed amount from the socket before every writtable event so
+each flush hands the same number of bytes to the kernel. The time per flush
+should stay flat no matter how much is sitting in the write buffer.
+
+"""
+
+import sys
+import time
+import socket
+
+import pyev
+
+sys.path.insert(0, '..')
+
+from whizzer.transport import SocketTransport
+
+
+CHUNK = 1024
+READ = 16 * 1024
+SIZES = [16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 2048 * 1024]
+
+
+def nothing(*args):
+    pass
+
+
+def bench(loop, size):
+    ssock, csock = socket.socketpair()
+    transport = SocketTransport(loop, ssock, nothing, nothing, max_size=size * 2)
+    transport.start()
+
+    chunk = b'x' * CHUNK
+    # fill the kernel buffers first so everything after this is buffered
+    while transport.write != transport.buffered_write:
+        transport.write(chunk)
+    for x in range(size // CHUNK):
+        transport.write(chunk)
+
+    flushes = 0
+    elapsed = 0.0
+    while transport.write_buffer_size > size // 2:
+        csock.recv(READ)
+        before = time.time()
+        loop.start(pyev.EVRUN_NOWAIT)
+        elapsed += time.time() - before
+        flushes += 1
+
+    transport.close()
+    csock.close()
+    return flushes, elapsed
+
+
+def main():
+    loop = pyev.default_loop()
+    for size in SIZES:
+        flushes, elapsed = bench(loop, size)
+        print("%8d buffered bytes: %6d flushes, %8.2f usec per flush" %
+              (size, flushes, elapsed / flushes * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -90,14 +90,9 @@ class AdderBench(Service):
         self.last_stats = time.time()
 
     def proxy_init(self):
-        self.proxy = ServiceProxy(self.loop, self.adder_path)
-        connected = False
-        while not connected:
-            try:
-                self.proxy.connect().result()
-                connected = True
-            except:
-                time.sleep(0.1)
+        # the adder may not be listening yet, keep trying in the background
+        self.proxy = ServiceProxy(self.loop, self.adder_path, reconnect=True)
+        self.proxy.connect()
 
     def run(self):
         self.signal_init()
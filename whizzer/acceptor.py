@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import array
+import socket
+import struct
+import logbook
+import pyev
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.server import SocketServer, UnixServer
+from whizzer.transport import ConnectionClosed, EAGAIN
+
+logger = logbook.Logger(__name__)
+
+#: load report sent by workers, (descriptors received, connections open)
+REPORT = struct.Struct('!II')
+
+
+class WorkerChannel(Protocol):
+    """The acceptor end of a control channel to a worker."""
+
+    def __init__(self, loop, acceptor):
+        Protocol.__init__(self, loop)
+        self.acceptor = acceptor
+        self.sent = 0
+        self.received = 0
+        self.connections = 0
+        self._buffer = bytes()
+
+    def connection_made(self, address):
+        self.acceptor.add_worker(self)
+
+    def connection_lost(self, reason):
+        self.acceptor.remove_worker(self)
+
+    def data(self, data):
+        """Handle load reports, only the latest one matters."""
+        self._buffer = self._buffer + data
+        count = len(self._buffer) // REPORT.size
+        if count:
+            end = count * REPORT.size
+            self.received, self.connections = REPORT.unpack(
+                self._buffer[end - REPORT.size:end])
+            self._buffer = self._buffer[end:]
+
+    def load(self):
+        """Connections the worker has plus those handed to it it has not
+        reported yet.
+
+        """
+        return self.connections + self.sent - self.received
+
+    def hand_off(self, sock):
+        """Pass a socket to the worker."""
+        fds = array.array('i', [sock.fileno()])
+        self.transport.sock.sendmsg([b'\0'],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds.tobytes())])
+        self.sent += 1
+
+
+class WorkerChannelFactory(ProtocolFactory):
+    """Builds the acceptor end of worker channels."""
+
+    def __init__(self, acceptor):
+        ProtocolFactory.__init__(self)
+        self.acceptor = acceptor
+
+    def build(self, loop):
+        return WorkerChannel(loop, self.acceptor)
+
+
+class AcceptorServer(SocketServer):
+    """A socket server that passes the connections it accepts on to worker
+    processes rather than handling them itself.
+
+    Workers (see AcceptorWorker) connect to a unix socket at path, each
+    connection is handed to the worker with the least connections according
+    to what the workers report. Unlike SO_REUSEPORT this keeps workers evenly
+    loaded when connections are long lived and unequal in cost.
+
+    """
+
+    def __init__(self, loop, sock, address, path, options=None):
+        """AcceptorServer
+
+        loop -- pyev loop
+        sock -- socket to listen on
+        address -- address of the socket
+        path -- path of the unix socket workers connect to
+        options -- optional SocketOptions applied to every accepted socket
+
+        """
+        SocketServer.__init__(self, loop, None, sock, address, options)
+        self.path = path
+        self.workers = []
+        self.handed_off = 0
+        self.control = UnixServer(self.loop, WorkerChannelFactory(self), path)
+        self.control.interrupt_watcher.stop()
+
+    def start(self):
+        """Start accepting connections and workers."""
+        self.control.start()
+        SocketServer.start(self)
+
+    def shutdown(self, reason=ConnectionClosed()):
+        """Shutdown the acceptor, workers keep serving the connections they
+        have already been given.
+
+        """
+        SocketServer.shutdown(self, reason)
+        self.control.shutdown()
+
+    def add_worker(self, channel):
+        """Called by a channel when a worker connects."""
+        self.workers.append(channel)
+        logger.info("worker connected, {} workers".format(len(self.workers)))
+
+    def remove_worker(self, channel):
+        """Called by a channel when a worker goes away."""
+        self.workers.remove(channel)
+        logger.warn("worker disconnected, {} workers".format(len(self.workers)))
+
+    def add_connection(self, sock, address):
+        """Hand an accepted socket to the least loaded worker."""
+        self.accepted += 1
+        if self.options:
+            self.options.apply(sock)
+        try:
+            for channel in sorted(self.workers, key=WorkerChannel.load):
+                try:
+                    channel.hand_off(sock)
+                    self.handed_off += 1
+                    return
+                except EnvironmentError as e:
+                    logger.warn("hand off failed, reason %s" % str(e))
+            self.refused += 1
+        finally:
+            sock.close()
+
+    def snapshot(self):
+        """Return a dict of the server metrics, including the workers."""
+        totals = SocketServer.snapshot(self)
+        totals['workers'] = len(self.workers)
+        totals['handed_off'] = self.handed_off
+        return totals
+
+class TcpAcceptor(AcceptorServer):
+    """An acceptor server that listens on an internet socket."""
+    def __init__(self, loop, host, port, path, backlog=256, options=None):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if options:
+            options.apply_listener(self.sock)
+        self.sock.bind((host, port))
+        self.sock.listen(backlog)
+        self.sock.setblocking(False)
+        AcceptorServer.__init__(self, loop, self.sock, self.address, path,
+                                options)
+
+
+class AcceptorWorker(SocketServer):
+    """A socket server that is given its connections by an AcceptorServer.
+
+    Its socket is a unix socket connected to the acceptor, readable events
+    receive descriptors rather than accepting connections. The number of
+    connections it has is reported back to the acceptor at most once per
+    loop iteration.
+
+    """
+
+    def __init__(self, loop, factory, path, options=None):
+        """AcceptorWorker
+
+        loop -- pyev loop
+        factory -- protocol factory
+        path -- path of the unix socket the acceptor listens for workers on
+        options -- optional SocketOptions applied to every socket handed over
+
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.setblocking(False)
+        SocketServer.__init__(self, loop, factory, sock, path, options)
+        self.received = 0
+        self.report_watcher = pyev.Prepare(self.loop, self._report)
+
+    def _readable(self, watcher, events):
+        """Called by the pyev watcher (self.read_watcher) whenever the
+        acceptor has sent descriptors, up to accept_batch are received.
+
+        """
+        ancsize = socket.CMSG_SPACE(array.array('i').itemsize)
+        for x in range(self.accept_batch):
+            if not self.read_watcher.active:
+                return
+
+            try:
+                msg, ancdata, flags, address = self.sock.recvmsg(1, ancsize)
+            except IOError as e:
+                if e.errno not in EAGAIN:
+                    self.shutdown(e)
+                return
+
+            if not msg:
+                logger.warn("acceptor went away, no longer receiving connections")
+                self.stop()
+                return
+
+            for level, kind, data in ancdata:
+                if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                    fds = array.array('i')
+                    fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+                    for fd in fds:
+                        self._received(socket.socket(fileno=fd))
+
+    def _received(self, sock):
+        """Serve a socket handed over by the acceptor."""
+        self.received += 1
+        self._changed()
+        try:
+            address = sock.getpeername()
+        except socket.error:
+            address = None
+        self.add_connection(sock, address)
+
+    def remove_connection(self, connection):
+        SocketServer.remove_connection(self, connection)
+        self._changed()
+
+    def _changed(self):
+        """Report the load to the acceptor before the loop next blocks."""
+        if not self.report_watcher.active:
+            self.report_watcher.start()
+
+    def _report(self, watcher, events):
+        """Called by the pyev watcher (self.report_watcher) to send a load
+        report.
+
+        """
+        watcher.stop()
+        try:
+            self.sock.send(REPORT.pack(self.received, len(self.connections)))
+        except EnvironmentError as e:
+            if e.errno not in EAGAIN:
+                logger.warn("load report failed, reason %s" % str(e))
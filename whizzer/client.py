@@ -19,17 +19,42 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import os
+import errno
 import socket  
 
 import signal
+import random
+import collections
 import logbook
 import pyev
 
 from whizzer.transport import SocketTransport, ConnectionClosed
-from whizzer.defer import Deferred
+from whizzer.defer import Deferred, CancelledError
+from whizzer.resolver import Resolver
+from whizzer.timer import TimerWheel
 
 logger = logbook.Logger(__name__)
 
+#: pool selection handing out the protocol with the fewest requests in flight
+LEAST_IN_FLIGHT = 'least_in_flight'
+
+#: pool selection handing out each protocol in turn
+ROUND_ROBIN = 'round_robin'
+
+#: connect errno values meaning the connect is still under way
+CONNECTING = tuple(getattr(errno, name) for name in
+    ('EINPROGRESS', 'EWOULDBLOCK', 'EAGAIN', 'EALREADY', 'EINTR')
+    if hasattr(errno, name))
+
+#: reconnecting client policy, protocols asked for while disconnected are
+#: given out once the connection is back
+QUEUE = 'queue'
+
+#: reconnecting client policy, asking for a protocol while disconnected
+#: fails with NotConnectedError
+FAIL = 'fail'
+
 
 class TimeoutError(Exception):
     pass
@@ -47,7 +72,11 @@ class Connection(object):
         self.client = client
         logger.debug('making transport')
         self.transport = SocketTransport(self.loop, self.sock,
-                                         self.protocol.data, self.closed)
+            self.protocol.data, self.closed,
+            read_views=getattr(self.protocol, 'read_views', False),
+            pause_cb=self.protocol.pause_writing,
+            resume_cb=self.protocol.resume_writing,
+            cork=getattr(self.protocol, 'cork', False))
         logger.debug('protocol.make_connection')
         self.protocol.make_connection(self.transport, self.addr)
         logger.debug('transport.start()')
@@ -56,7 +85,7 @@ class Connection(object):
 
     def closed(self, reason):
         """Callback performed when the transport is closed."""
-        self.client.remove_connection(self)
+        self.client.remove_connection(self, reason)
         self.protocol.connection_lost(reason)
         if not isinstance(reason, ConnectionClosed):
             logger.warn("connection closed, reason {}".format(reason))
@@ -73,20 +102,62 @@ class ConnectorStartedError(Exception):
 
 
 class Connector(object):
-    """State machine for a connection to a remote socket."""
+    """State machine for a connection to a remote socket.
+
+    Connects without blocking and checks SO_ERROR once the socket is
+    writtable. Further addresses, when given, are tried in turn like happy
+    eyeballs: a failed attempt moves straight on to the next address and
+    one still going after delay seconds is left running while the next is
+    started. The first attempt to connect wins.
+
+    The timeouts are kept in the loop TimerWheel, an attempt costs a single
+    pyev watcher. The outcome goes to connected_cb and failed_cb when given,
+    otherwise to a deferred returned by start.
+
+    """
+
+    def __init__(self, loop, sock, addr, timeout, addresses=(), options=None,
+                 delay=0.25, connected_cb=None, failed_cb=None):
+        """Connector
+
+        loop -- pyev loop
+        sock -- socket for the first attempt
+        addr -- address of the first attempt
+        timeout -- seconds allowed for the whole connect
+        addresses -- further (family, address) to try
+        options -- optional SocketOptions applied to further sockets
+        delay -- seconds before starting the next attempt alongside one
+                 that has not finished
+        connected_cb -- optional callable given the connected socket
+        failed_cb -- optional callable given the error when the connect
+                     fails, times out or is cancelled
 
-    def __init__(self, loop, sock, addr, timeout):
+        """
         self.loop = loop
         self.sock = sock
         self.addr = addr
         self.timeout = timeout
-        self.connect_watcher = pyev.Io(self.sock, pyev.EV_WRITE, self.loop, self._connected)
-        self.timeout_watcher = pyev.Timer(self.timeout, 0.0, self.loop, self._timeout)
-        self.deferred = Deferred(self.loop)
+        self.addresses = list(addresses)
+        self.options = options
+        self.delay = delay
+        self.attempts = []
+        self.error = None
+        self.wheel = TimerWheel.for_loop(self.loop)
+        self.timeout_entry = self.wheel.timeout(self._timeout)
+        self.delay_entry = None
+        if connected_cb is None:
+            self.deferred = Deferred(self.loop)
+            connected_cb = self.deferred.callback
+            failed_cb = self.deferred.errback
+        else:
+            self.deferred = None
+        self.connected_cb = connected_cb
+        self.failed_cb = failed_cb
         self.started = False
         self.connected = False
         self.timedout = False
         self.errored = False
+        self.cancelled = False
 
     def start(self):
         """Start the connector state machine."""
@@ -94,55 +165,191 @@ class Connector(object):
             raise ConnectorStartedError()
 
         self.started = True
+        self.timeout_entry.schedule(self.loop.now() + self.timeout)
+        self._attempt(self.sock, self.addr)
+        return self.deferred
 
-        try:
-            self.connect_watcher.start()
-            self.timeout_watcher.start()
-            self.sock.connect(self.addr)
-        except IOError as e:
-            self.errored = True
+    def cancel(self):
+        """Cancel a connector from completing, failing it with a
+        CancelledError.
+
+        """
+        if self.started and not self.done():
+            self.cancelled = True
             self._finish()
-            self.deferred.errback(e)
+            self.failed_cb(CancelledError())
+
+    def done(self):
+        """Return True once the connector has an outcome."""
+        return (self.connected or self.timedout or self.errored
+                or self.cancelled)
+
+    def _attempt(self, sock, addr):
+        """Start connecting sock to addr."""
+        sock.setblocking(False)
+        watcher = pyev.Io(sock, pyev.EV_WRITE, self.loop, self._writtable,
+                          (sock, addr))
+        self.attempts.append(watcher)
+        try:
+            error = sock.connect_ex(addr)
+        except (socket.error, TypeError, ValueError) as e:
+            self._failed(watcher, e)
+            return
+
+        if error == 0:
+            self._connected(watcher)
+        elif error in CONNECTING:
+            watcher.start()
+            if self.addresses:
+                if self.delay_entry is None:
+                    self.delay_entry = self.wheel.timeout(self._delayed)
+                if not self.delay_entry.active:
+                    self.delay_entry.schedule(self.loop.now() + self.delay)
+        else:
+            self._failed(watcher, socket.error(error, os.strerror(error)))
 
-        return self.deferred
+    def _next(self):
+        """Start an attempt on the next address."""
+        family, addr = self.addresses.pop(0)
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except socket.error as e:
+            self.error = e
+            if self.addresses:
+                self._next()
+            elif not self.attempts:
+                self._fail(e)
+            return
+        if self.options:
+            self.options.apply(sock)
+        self._attempt(sock, addr)
+
+    def _writtable(self, watcher, events):
+        """Called by a pyev watcher (self.attempts) when an attempt has
+        finished one way or the other.
 
-    def cancel(self):
-        """Cancel a connector from completing."""
-        if self.started and not self.connected and not self.timedout:
-            self.connect_watcher.stop()
-            self.timeout_watcher.stop()
+        """
+        sock, addr = watcher.data
+        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            self._failed(watcher, socket.error(error, os.strerror(error)))
+        else:
+            self._connected(watcher)
+
+    def _delayed(self):
+        """Called by the timer wheel when the latest attempt has taken too
+        long to wait for alone.
 
-    def _connected(self, watcher, events):
-        """Connector is successful, return the socket."""
+        """
+        if self.addresses:
+            self._next()
+
+    def _connected(self, watcher):
+        """An attempt is successful, return its socket."""
+        self.attempts.remove(watcher)
+        watcher.stop()
+        self.sock, self.addr = watcher.data
         self.connected = True
         self._finish()
-        self.deferred.callback(self.sock)
+        self.connected_cb(self.sock)
+
+    def _failed(self, watcher, error):
+        """An attempt failed, move on to the next address if there is one."""
+        watcher.stop()
+        self.attempts.remove(watcher)
+        watcher.data[0].close()
+        self.error = error
+        logger.debug("connect to {} failed, reason {}".format(watcher.data[1],
+                                                             error))
+        if self.addresses:
+            if self.delay_entry is not None:
+                self.delay_entry.cancel()
+            self._next()
+        elif not self.attempts:
+            self._fail(error)
+
+    def _fail(self, error):
+        """Every attempt failed, fail with the last error."""
+        self.errored = True
+        self._finish()
+        self.failed_cb(error)
 
-    def _timeout(self, watcher, events):
-        """Connector timed out, raise a timeout error."""
+    def _timeout(self):
+        """Called by the timer wheel, the connector timed out."""
+        if self.done():
+            return
         self.timedout = True
         self._finish()
-        self.deferred.errback(TimeoutError())
+        self.failed_cb(TimeoutError())
 
     def _finish(self):
-        """Finalize the connector."""
-        self.connect_watcher.stop()
-        self.timeout_watcher.stop()
-
-
-class SocketClientConnectedError(object):
+        """Finalize the connector, closing attempts that lost."""
+        for watcher in self.attempts:
+            watcher.stop()
+            watcher.data[0].close()
+        self.attempts = []
+        self.addresses = []
+        self.timeout_entry.cancel()
+        if self.delay_entry is not None:
+            self.delay_entry.cancel()
+
+
+class SocketClientConnectedError(Exception):
     """Raised when a client is already connected."""
 
 
-class SocketClientConnectingError(object):
+class SocketClientConnectingError(Exception):
     """Raised when a client is already connecting."""
 
 
+class NotConnectedError(Exception):
+    """Raised when a protocol is asked for while a client is disconnected."""
+
+
+class Backoff(object):
+    """Capped exponential backoff with jitter.
+
+    Each delay doubles (by factor) from initial up to maximum, and is then
+    drawn at random from its upper half so clients that lost their
+    connections together do not all come back at the same moment.
+
+    """
+
+    def __init__(self, initial=0.1, maximum=30.0, factor=2.0, jitter=True):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self):
+        """Return the delay before the next attempt."""
+        delay = min(self.maximum,
+                    self.initial * self.factor ** min(self.attempts, 64))
+        self.attempts += 1
+        if self.jitter:
+            delay = random.uniform(delay / 2.0, delay)
+        return delay
+
+    def reset(self):
+        """Start from the initial delay again, after a success."""
+        self.attempts = 0
+
+
 class SocketClient(object):
     """A simple socket client."""
-    def __init__(self, loop, factory):
+    def __init__(self, loop, factory, options=None):
+        """Socket client.
+
+        loop -- pyev loop
+        factory -- protocol factory
+        options -- optional SocketOptions applied to the socket before it
+                   connects
+
+        """
         self.loop = loop
         self.factory = factory
+        self.options = options
         self.connector = None
         self.connection = None
         self.connect_deferred = None
@@ -155,41 +362,79 @@ class SocketClient(object):
         self.sock = None
         self.addr = None
 
+        #: optional callable given the client and the reason whenever its
+        #: connection is lost
+        self.lost_cb = None
+
     def _interrupt(self, watcher, events):
         if self.connection:
             self.connection.close()
 
     def _connect(self, sock, addr, timeout):
         """Start watching the socket for it to be writtable."""
+        self._check_idle()
+        self.connect_deferred = d = Deferred(self.loop, self._cancelled)
+        self._start_connector(sock, addr, timeout)
+        return d
+
+    def cancel(self):
+        """Cancel a connect under way, its deferred fails with a
+        CancelledError.
+
+        """
+        d = self.connect_deferred
+        self._abandon()
+        if d is not None and not d.called:
+            d.errback(CancelledError())
+
+    def _cancelled(self, d):
+        """Called when the connect deferred itself is cancelled."""
+        if d is self.connect_deferred:
+            self._abandon()
+
+    def _abandon(self):
+        """Drop the connect under way without telling anyone."""
+        self.connect_deferred = None
+        if self.connector:
+            self.connector.cancel()
+
+    def _check_idle(self):
+        """Raise if connected or connecting already."""
         if self.connection:
             raise SocketClientConnectedError()
 
         if self.connector:
             raise SocketClientConnectingError()
 
-        self.connect_deferred = Deferred(self.loop)
+    def _start_connector(self, sock, addr, timeout, addresses=()):
+        """Connect to addr, or failing that to the further addresses."""
+        if self.options:
+            self.options.apply(sock)
         self.sock = sock
         self.addr = addr
-        self.connector = Connector(self.loop, sock, addr, timeout)
-        self.connector.deferred.add_callback(self._connected)
-        self.connector.deferred.add_errback(self._connect_failed)
+        self.connector = Connector(self.loop, sock, addr, timeout, addresses,
+                                   self.options, connected_cb=self._connected,
+                                   failed_cb=self._connect_failed)
         self.connector.start()
 
-        return self.connect_deferred
-
     def _connected(self, sock):
         """When the socket is writtable, the socket is ready to be used."""
         logger.debug('socket connected, building protocol')
+        self.sock = sock
+        self.addr = self.connector.addr
         self.protocol = self.factory.build(self.loop)
         self.connection = Connection(self.loop, self.sock, self.addr,
             self.protocol, self) 
         self.connector = None
-        self.connect_deferred.callback(self.protocol)
+        d, self.connect_deferred = self.connect_deferred, None
+        d.callback(self.protocol)
 
     def _connect_failed(self, reason):
         """Connect failed."""
         self.connector = None
-        self.connect_deferred.errback(reason)
+        d, self.connect_deferred = self.connect_deferred, None
+        if d is not None:
+            d.errback(reason)
 
     def _disconnect(self):
         """Disconnect from a socket."""
@@ -204,14 +449,16 @@ class SocketClient(object):
 
         """
 
-    def remove_connection(self, connection):
+    def remove_connection(self, connection, reason=None):
         self.connection = None
+        if self.lost_cb:
+            self.lost_cb(self, reason)
 
 
 class UnixClient(SocketClient):
     """A unix client is a socket client that connects to a domain socket."""
-    def __init__(self, loop, factory, path):
-        SocketClient.__init__(self, loop, factory)
+    def __init__(self, loop, factory, path, options=None):
+        SocketClient.__init__(self, loop, factory, options)
         self.path = path
 
     def connect(self, timeout=5.0):
@@ -223,15 +470,341 @@ class UnixClient(SocketClient):
 
 
 class TcpClient(SocketClient):
-    """A unix client is a socket client that connects to a domain socket."""
-    def __init__(self, loop, factory, host, port):
-        SocketClient.__init__(self, loop, factory)
+    """A tcp client is a socket client that connects to an internet socket.
+
+    The host is resolved by a Resolver without blocking the loop and each
+    address it resolves to is tried, see Connector.
+
+    """
+    def __init__(self, loop, factory, host, port, options=None,
+                 resolver=None):
+        SocketClient.__init__(self, loop, factory, options)
         self.host = host
         self.port = port
+        self.resolver = resolver or Resolver.for_loop(self.loop)
+        self.resolving = None
 
     def connect(self, timeout=5.0):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        return self._connect(sock, (self.host, self.port), timeout)
+        if self.resolving:
+            raise SocketClientConnectingError()
+        self._check_idle()
+
+        self.connect_deferred = d = Deferred(self.loop, self._cancelled)
+        addresses = self.resolver.cached(self.host, self.port)
+        if addresses is not None:
+            self._connect_to(addresses, timeout)
+            return d
+
+        self.resolving = self.resolver.resolve(self.host, self.port)
+        self.resolving.add_callbacks(self._resolved, self._resolve_failed,
+            callback_args=(self.resolving, self.loop.now() + timeout),
+            errback_args=(self.resolving,))
+        return d
+
+    def _abandon(self):
+        self.resolving = None
+        SocketClient._abandon(self)
+
+    def _resolved(self, addresses, resolving, deadline):
+        if resolving is not self.resolving:
+            return
+        self.resolving = None
+        self._connect_to(addresses, max(deadline - self.loop.now(), 0.0))
+
+    def _connect_to(self, addresses, timeout):
+        family, addr = addresses[0]
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except socket.error as e:
+            self._connect_failed(e)
+            return
+        self._start_connector(sock, addr, timeout, addresses[1:])
+
+    def _resolve_failed(self, reason, resolving):
+        if resolving is not self.resolving:
+            return
+        self.resolving = None
+        self._connect_failed(reason)
 
     def disconnect(self):
         return self._disconnect()
+
+
+class PoolEmptyError(Exception):
+    """Raised when a pool has no connected protocol to hand out."""
+
+
+class ConnectionPool(object):
+    """Keeps a number of connections to one endpoint open and hands out their
+    protocols.
+
+    Each connection is a SocketClient of its own, made by client_factory.
+    Connections that are lost or fail to connect are replaced without the
+    user of the pool having to notice, failed connects are retried after a
+    Backoff delay.
+
+    """
+
+    def __init__(self, loop, client_factory, size=4,
+                 selection=LEAST_IN_FLIGHT, timeout=5.0, backoff=None):
+        """ConnectionPool
+
+        loop -- pyev loop
+        client_factory -- callable given the loop returning an unconnected
+                          SocketClient, TcpClient(loop, factory, host, port)
+                          for example
+        size -- number of connections to keep open
+        selection -- LEAST_IN_FLIGHT or ROUND_ROBIN
+        timeout -- seconds allowed for each connect
+        backoff -- Backoff giving the delays before retrying failed
+                   connects
+
+        """
+        self.loop = loop
+        self.client_factory = client_factory
+        self.size = size
+        self.selection = selection
+        self.timeout = timeout
+        self.clients = set()
+        self.protocols = []
+        self.closing = False
+        self.ready = Deferred(self.loop)
+        self.handed_out = 0
+        self.connects = 0
+        self.failures = 0
+        self.lost = 0
+        self._next = 0
+        self.backoff = backoff or Backoff()
+        self.retry_watcher = pyev.Timer(0.0, 0.0, self.loop, self._replenish)
+        self.sigint_watcher = pyev.Signal(signal.SIGINT, self.loop,
+                                          self._interrupt)
+        self.sigint_watcher.start()
+
+    def start(self):
+        """Start connecting.
+
+        Returns a deferred called back with the pool once the first
+        connection is made.
+
+        """
+        self._replenish()
+        return self.ready
+
+    def get(self):
+        """Return a connected protocol chosen by the selection policy.
+
+        Raises PoolEmptyError if there is none.
+
+        """
+        if not self.protocols:
+            raise PoolEmptyError()
+
+        self.handed_out += 1
+        if self.selection == ROUND_ROBIN:
+            self._next = (self._next + 1) % len(self.protocols)
+            return self.protocols[self._next]
+        return min(self.protocols,
+                   key=lambda p: (p.writing_paused, p.in_flight()))
+
+    def stats(self):
+        """Return a dict of the pool utilization."""
+        in_flight = sum(p.in_flight() for p in self.protocols)
+        connected = len(self.protocols)
+        return {'size': self.size,
+                'connected': connected,
+                'connecting': len(self.clients) - connected,
+                'in_flight': in_flight,
+                'utilization': in_flight / float(connected) if connected else 0.0,
+                'handed_out': self.handed_out,
+                'connects': self.connects,
+                'failures': self.failures,
+                'lost': self.lost}
+
+    def close(self):
+        """Close every connection, the pool is not refilled afterwards."""
+        self.closing = True
+        if self.retry_watcher.active:
+            self.retry_watcher.stop()
+        self.sigint_watcher.stop()
+        for client in list(self.clients):
+            client.disconnect()
+        self.clients = set()
+        self.protocols = []
+
+    def _interrupt(self, watcher, events):
+        self.close()
+
+    def _replenish(self, watcher=None, events=None):
+        """Start connecting until the pool is full again, called by the pyev
+        watcher (self.retry_watcher) after failed connects.
+
+        """
+        while not self.closing and len(self.clients) < self.size:
+            self._spawn()
+
+    def _spawn(self):
+        """Start a new connection."""
+        client = self.client_factory(self.loop)
+        client.sigint_watcher.stop()
+        client.lost_cb = self._lost
+        self.clients.add(client)
+        client.connect(self.timeout).add_callbacks(self._connected,
+            self._failed, callback_args=(client,), errback_args=(client,))
+
+    def _connected(self, protocol, client):
+        if self.closing:
+            client.disconnect()
+            return
+        self.connects += 1
+        self.backoff.reset()
+        self.protocols.append(protocol)
+        if not self.ready.called:
+            self.ready.callback(self)
+
+    def _failed(self, reason, client):
+        self.failures += 1
+        self.clients.discard(client)
+        logger.warn("pool connect failed, reason {}".format(reason))
+        if not self.closing and not self.retry_watcher.active:
+            self.retry_watcher.set(self.backoff.next(), 0.0)
+            self.retry_watcher.start()
+
+    def _lost(self, client, reason):
+        """Called by a client whose connection has been lost."""
+        if self.closing or client not in self.clients:
+            return
+        self.lost += 1
+        self.clients.discard(client)
+        if client.protocol in self.protocols:
+            self.protocols.remove(client.protocol)
+        self._replenish()
+
+
+class ReconnectingClient(object):
+    """Keeps a SocketClient connected, reconnecting whenever the connection
+    is lost or a connect fails.
+
+    Reconnects are scheduled with a pyev timer after a Backoff delay, the
+    loop keeps running in the meantime. Callbacks added with
+    add_reconnect_callback are given every new protocol, so that whatever
+    was bound to the last one (an rpc proxy for example) can be rebound.
+
+    """
+
+    def __init__(self, loop, client, backoff=None, policy=QUEUE, timeout=5.0,
+                 max_queued=1024):
+        """ReconnectingClient
+
+        loop -- pyev loop
+        client -- the SocketClient to keep connected
+        backoff -- Backoff giving the delays between attempts
+        policy -- QUEUE or FAIL, what happens when a protocol is asked for
+                  while disconnected
+        timeout -- seconds allowed for each connect
+        max_queued -- most requests for a protocol that may wait with QUEUE
+
+        """
+        self.loop = loop
+        self.client = client
+        self.client.lost_cb = self._lost
+        self.client.sigint_watcher.stop()
+        self.backoff = backoff or Backoff()
+        self.policy = policy
+        self.timeout = timeout
+        self.max_queued = max_queued
+        self.protocol = None
+        self.connected = False
+        self.closing = False
+        self.connects = 0
+        self.failures = 0
+        self.waiting = collections.deque()
+        self.reconnect_cbs = []
+        self.retry_watcher = pyev.Timer(0.0, 0.0, self.loop, self._retry)
+        self.sigint_watcher = pyev.Signal(signal.SIGINT, self.loop,
+                                          self._interrupt)
+        self.sigint_watcher.start()
+
+    def start(self):
+        """Start connecting, returns the deferred of when_connected."""
+        self._connect()
+        return self.when_connected()
+
+    def add_reconnect_callback(self, callback):
+        """Call callback with the protocol of every connection made."""
+        self.reconnect_cbs.append(callback)
+
+    def when_connected(self):
+        """Return a deferred called back with the connected protocol.
+
+        While disconnected the deferred waits for the connection with the
+        QUEUE policy and fails with NotConnectedError with the FAIL policy,
+        or once max_queued are already waiting.
+
+        """
+        d = Deferred(self.loop)
+        if self.connected:
+            d.callback(self.protocol)
+        elif (self.closing or self.policy == FAIL
+              or len(self.waiting) >= self.max_queued):
+            d.errback(NotConnectedError())
+        else:
+            self.waiting.append(d)
+        return d
+
+    def close(self):
+        """Disconnect and stop reconnecting, anything waiting fails."""
+        self.closing = True
+        if self.retry_watcher.active:
+            self.retry_watcher.stop()
+        self.sigint_watcher.stop()
+        self.client.disconnect()
+        waiting = self.waiting
+        self.waiting = collections.deque()
+        for d in waiting:
+            d.errback(NotConnectedError())
+
+    def _interrupt(self, watcher, events):
+        self.close()
+
+    def _connect(self):
+        self.client.connect(self.timeout).add_callbacks(self._connected,
+                                                        self._failed)
+
+    def _connected(self, protocol):
+        if self.closing:
+            self.client.disconnect()
+            return
+        self.connects += 1
+        self.backoff.reset()
+        self.protocol = protocol
+        self.connected = True
+        for callback in list(self.reconnect_cbs):
+            callback(protocol)
+        waiting = self.waiting
+        self.waiting = collections.deque()
+        for d in waiting:
+            d.callback(protocol)
+
+    def _failed(self, reason):
+        self.failures += 1
+        logger.warn("connect failed, reason {}".format(reason))
+        self._schedule()
+
+    def _lost(self, client, reason):
+        """Called by the client when its connection has been lost."""
+        self.connected = False
+        self.protocol = None
+        self._schedule()
+
+    def _schedule(self):
+        """Reconnect after the next backoff delay."""
+        if self.closing or self.retry_watcher.active:
+            return
+        delay = self.backoff.next()
+        logger.info("reconnecting in {:.2f} seconds".format(delay))
+        self.retry_watcher.set(delay, 0.0)
+        self.retry_watcher.start()
+
+    def _retry(self, watcher, events):
+        """Called by the pyev watcher (self.retry_watcher) to reconnect."""
+        self._connect()
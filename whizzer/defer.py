@@ -160,9 +160,9 @@ class Deferred(object):
         the first argument to the next errback in the chain.
         
         """
-        self._callbacks.appendleft((callback, errback, callback_args,
-                               callback_kwargs, errback_args,
-                               errback_kwargs))
+        self._callbacks.appendleft((callback, errback, callback_args or (),
+                               callback_kwargs or {}, errback_args or (),
+                               errback_kwargs or {}))
 
         if self.called:
             self._do_callbacks()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import sys
+import json
+import socket
+import subprocess
+import logbook
+
+from whizzer.defer import Deferred
+
+logger = logbook.Logger(__name__)
+
+#: environment variable mapping listening addresses to inherited descriptors
+LISTEN_FDS = 'WHIZZER_LISTEN_FDS'
+
+
+def _key(address):
+    """Name a listening address, (host, port) or a unix path."""
+    if isinstance(address, tuple):
+        return '%s:%s' % address
+    return address
+
+def inherit(address, family):
+    """Return the listening socket for address handed down by a predecessor
+    process, or None if there is none.
+
+    Each socket is only given out once.
+
+    address -- (host, port) or unix socket path
+    family -- socket family of the listening socket
+
+    """
+    fds = json.loads(os.environ.get(LISTEN_FDS, '{}'))
+    fd = fds.pop(_key(address), None)
+    if fd is None:
+        return None
+    os.environ[LISTEN_FDS] = json.dumps(fds)
+    sock = socket.fromfd(fd, family, socket.SOCK_STREAM)
+    os.close(fd)
+    logger.info("inherited listening socket for {}".format(address))
+    return sock
+
+def restart(servers, argv=None, timeout=30.0):
+    """Start a successor process that inherits the listening sockets of the
+    given servers, then drain the servers.
+
+    The listening sockets stay open throughout, connections made while the
+    successor starts wait in the listen backlog until it accepts them. A
+    TcpServer or UnixServer created by the successor for the same address
+    picks up its socket with inherit rather than binding a new one.
+
+    Returns the successor (a subprocess.Popen) and a deferred called back
+    with the number of connections dropped once every server has drained,
+    at which point the process can exit.
+
+    servers -- listening servers (SocketServer) sharing a loop
+    argv -- command of the successor, defaults to this process's own
+    timeout -- seconds allowed for each server to drain
+
+    """
+    fds = dict((_key(address), sock.fileno())
+               for server in servers for address, sock in server.sockets())
+    env = dict(os.environ)
+    env[LISTEN_FDS] = json.dumps(fds)
+    if argv is None:
+        argv = [sys.executable] + sys.argv
+    successor = subprocess.Popen(argv, env=env, pass_fds=list(fds.values()))
+    logger.info("started successor {}".format(successor.pid))
+
+    drained = Deferred(servers[0].loop)
+    pending = [len(servers), 0]
+    def server_drained(forced):
+        pending[0] -= 1
+        pending[1] += forced
+        if not pending[0]:
+            drained.callback(pending[1])
+
+    for server in servers:
+        if hasattr(server, 'keep_path'):
+            server.keep_path()
+        server.drain(timeout).add_callback(server_drained)
+    return successor, drained
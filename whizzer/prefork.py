@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import copy
+import signal
+import socket
+import multiprocessing
+import logbook
+import pyev
+
+from whizzer.defer import Deferred
+from whizzer.process import Process
+from whizzer.server import TcpServer, ShutdownError
+from whizzer.sockopt import SocketOptions
+
+logger = logbook.Logger(__name__)
+
+
+class Worker(Process):
+    """A worker process of a PreforkServer."""
+
+    def __init__(self, loop, server, number):
+        Process.__init__(self, loop, server.run_worker, number)
+        self.server = server
+        self.number = number
+
+    def crashed(self):
+        """Tell the server the worker has exited."""
+        self.server.worker_exited(self)
+
+
+class PreforkServer(object):
+    """A tcp server spread over several processes.
+
+    Each worker process runs its own loop and TcpServer bound with
+    SO_REUSEPORT to the same address, the kernel spreads incoming
+    connections over the listeners. Workers that die are restarted, SIGTERM
+    or SIGINT shuts every worker down.
+
+    """
+
+    def __init__(self, loop, factory, host, port, workers=None, backlog=256,
+                 options=None, restart_delay=1.0, kill_timeout=10.0):
+        """PreforkServer
+
+        loop -- pyev loop
+        factory -- protocol factory used by every worker
+        host -- address to listen on
+        port -- port to listen on
+        workers -- number of worker processes, defaults to the cpu count
+        backlog -- listen backlog of each worker
+        options -- optional SocketOptions, reuseport is always turned on
+        restart_delay -- seconds to wait before restarting a dead worker
+        kill_timeout -- seconds to wait for workers to exit on shutdown
+                        before killing them
+
+        """
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise NotImplementedError("SO_REUSEPORT is not available")
+
+        self.loop = loop
+        self.factory = factory
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.options = copy.copy(options) or SocketOptions()
+        self.options.reuseport = True
+        self.count = workers or multiprocessing.cpu_count()
+        self.restart_delay = restart_delay
+        self.kill_timeout = kill_timeout
+        self.workers = dict()
+        self.restart_watchers = dict()
+        self.stopping = False
+        self.stopped = Deferred(self.loop)
+        self.sigterm_watcher = pyev.Signal(signal.SIGTERM, self.loop,
+                                           self._terminate)
+        self.sigint_watcher = pyev.Signal(signal.SIGINT, self.loop,
+                                          self._terminate)
+        self.kill_watcher = pyev.Timer(self.kill_timeout, 0.0, self.loop,
+                                       self._kill)
+
+    def start(self):
+        """Start the worker processes."""
+        self.sigterm_watcher.start()
+        self.sigint_watcher.start()
+        for number in range(self.count):
+            self._spawn(number)
+
+    def shutdown(self):
+        """Ask every worker to shutdown.
+
+        Returns a Deferred called back once every worker has exited.
+
+        """
+        if not self.stopping:
+            self.stopping = True
+            logger.info("shutting down {} workers".format(len(self.workers)))
+            for watcher in self.restart_watchers.values():
+                watcher.stop()
+            self.restart_watchers = dict()
+            for worker in self.workers.values():
+                self._signal(worker, signal.SIGTERM)
+            if self.workers:
+                self.kill_watcher.start()
+            else:
+                self.stopped.callback(None)
+        return self.stopped
+
+    def _terminate(self, watcher, events):
+        """Handle SIGTERM and SIGINT by shutting down, the loop is stopped
+        once every worker has exited.
+
+        """
+        self.shutdown().add_callback(self._stop_loop)
+
+    def _stop_loop(self, result):
+        self.loop.stop(pyev.EVBREAK_ALL)
+
+    def _kill(self, watcher, events):
+        """Kill workers that have not exited in time."""
+        for worker in self.workers.values():
+            logger.warn("killing worker {}".format(worker.child_pid))
+            self._signal(worker, signal.SIGKILL)
+
+    def _signal(self, worker, signum):
+        """Send a signal to a worker that may have already exited."""
+        try:
+            os.kill(worker.child_pid, signum)
+        except OSError:
+            pass
+
+    def _spawn(self, number):
+        """Fork a worker process."""
+        worker = Worker(self.loop, self, number)
+        self.workers[number] = worker
+        worker.start()
+        logger.info("started worker {} as {}".format(number, worker.child_pid))
+
+    def _restart(self, watcher, events):
+        """Called by a restart watcher to replace a dead worker."""
+        del self.restart_watchers[watcher.data]
+        self._spawn(watcher.data)
+
+    def worker_exited(self, worker):
+        """Called when a worker process exits, restarting it unless the
+        server is shutting down.
+
+        """
+        del self.workers[worker.number]
+        if self.stopping:
+            if not self.workers:
+                self.kill_watcher.stop()
+                logger.info("all workers exited")
+                self.stopped.callback(None)
+            return
+
+        logger.error("worker {} exited with status {}".format(
+            worker.child_pid, worker.watcher.rstatus))
+        watcher = pyev.Timer(self.restart_delay, 0.0, self.loop,
+                             self._restart, worker.number)
+        self.restart_watchers[worker.number] = watcher
+        watcher.start()
+
+    def run_worker(self, number):
+        """Run a worker, called in the forked worker process."""
+        self.sigterm_watcher.stop()
+        self.sigint_watcher.stop()
+        self.kill_watcher.stop()
+        for watcher in self.restart_watchers.values():
+            watcher.stop()
+        for worker in self.workers.values():
+            if worker.watcher:
+                worker.watcher.stop()
+
+        self.server = TcpServer(self.loop, self.factory, self.host, self.port,
+                                self.backlog, self.options)
+        self.worker_sigterm_watcher = pyev.Signal(signal.SIGTERM, self.loop,
+                                                  self._worker_terminate)
+        self.worker_sigterm_watcher.start()
+        self.server.start()
+        self.loop.start()
+
+    def _worker_terminate(self, watcher, events):
+        """Handle SIGTERM in a worker."""
+        try:
+            self.server.shutdown()
+        except ShutdownError:
+            pass
+        self.loop.stop(pyev.EVBREAK_ALL)
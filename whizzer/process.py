@@ -78,4 +78,4 @@ class Process(object):
         anything more than log that the process died.
 
         """
-        self.logger.error("%s crashed" % self.child_pid)
+        logger.error("%s crashed" % self.child_pid)
@@ -20,9 +20,26 @@
 # THE SOFTWARE.
 
 class Protocol(object):
-    """Basis of all client handling functionality."""
+    """Basis of all client handling functionality.
+
+    The base class has slots to keep idle connections small, subclasses that
+    do not declare __slots__ themselves get a __dict__ as usual.
+
+    """
+
+    __slots__ = ('loop', 'transport', 'connected', 'writing_paused')
+
+    #: data() may be given a memoryview only valid for the duration of the
+    #: call instead of bytes
+    read_views = False
+
+    #: writes are gathered and sent once per loop iteration, see
+    #: SocketTransport
+    cork = False
+
     def __init__(self, loop):
         self.loop = loop
+        self.writing_paused = False
 
     def make_connection(self, transport, address):
         """Called externally when the transport is ready."""
@@ -39,9 +56,40 @@ class Protocol(object):
     def data(self, data):
         """Handle an incoming stream of data."""
 
+    def pause_writing(self):
+        """Called when the transport write buffer is over its high water mark.
+
+        Producers should stop writing until resume_writing is called.
+        Overriding methods should call this one.
+
+        """
+        self.writing_paused = True
+
+    def resume_writing(self):
+        """Called when the transport write buffer has drained to its low
+        water mark.
+
+        """
+        self.writing_paused = False
+
+    def in_flight(self):
+        """Return the number of requests this protocol has outstanding."""
+        return 0
+
     def lose_connection(self):
         self.transport.close()
 
+class DatagramProtocol(Protocol):
+    """Basis of all datagram handling functionality."""
+
+    __slots__ = ()
+
+    def datagram_received(self, data, address):
+        """Handle a datagram from address."""
+
+    def error_received(self, error):
+        """Handle an error sending or receiving a datagram."""
+
 class ProtocolFactory(object):
     """Protocol factory."""
     def build(self, loop):
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import queue
+import socket
+import threading
+import collections
+import logbook
+import pyev
+
+from whizzer.defer import Deferred
+
+logger = logbook.Logger(__name__)
+
+
+def _interleave(infos):
+    """Order getaddrinfo results alternating between address families,
+    starting with the family listed first, as happy eyeballs suggests.
+
+    """
+    families = collections.OrderedDict()
+    for family, kind, proto, name, address in infos:
+        addresses = families.setdefault(family, [])
+        if (family, address) not in addresses:
+            addresses.append((family, address))
+    ordered = []
+    while families:
+        for family in list(families):
+            addresses = families[family]
+            ordered.append(addresses.pop(0))
+            if not addresses:
+                del families[family]
+    return ordered
+
+
+class Resolver(object):
+    """Resolves host names with getaddrinfo in a small pool of threads so
+    the loop never blocks on DNS.
+
+    Results come back to the loop through a pyev.Async watcher and are
+    cached for ttl seconds, lookups of a name already being resolved share
+    the one getaddrinfo call. Numeric addresses are resolved straight away.
+
+    There is one resolver per loop, see for_loop.
+
+    """
+
+    #: resolvers by loop
+    resolvers = dict()
+
+    @classmethod
+    def for_loop(cls, loop):
+        """Return the resolver for a loop, creating it if needed."""
+        resolver = cls.resolvers.get(loop)
+        if resolver is None:
+            resolver = cls.resolvers[loop] = cls(loop)
+        return resolver
+
+    def __init__(self, loop, threads=4, ttl=60.0):
+        """Resolver
+
+        loop -- pyev loop
+        threads -- most getaddrinfo calls made at once
+        ttl -- seconds a resolved name is cached for
+
+        """
+        self.loop = loop
+        self.ttl = ttl
+        self.max_threads = threads
+        self.threads = []
+        self.requests = queue.Queue()
+        self.results = collections.deque()
+        self.cache = dict()
+        self.pending = dict()
+        self.lookups = 0
+        self.hits = 0
+        self.async_watcher = pyev.Async(self.loop, self._deliver)
+
+    def resolve(self, host, port, family=socket.AF_UNSPEC,
+                kind=socket.SOCK_STREAM):
+        """Resolve host and port.
+
+        Returns a deferred called back with a list of (family, address)
+        ordered for connecting, or errbacked with the socket.gaierror.
+
+        """
+        d = Deferred(self.loop)
+        addresses = self.cached(host, port, family, kind)
+        if addresses is not None:
+            d.callback(addresses)
+            return d
+
+        key = (host, port, family, kind)
+        if key in self.pending:
+            self.pending[key].append(d)
+            return d
+
+        self.lookups += 1
+        self.pending[key] = [d]
+        if not self.async_watcher.active:
+            self.async_watcher.start()
+        if len(self.threads) < min(self.max_threads, len(self.pending)):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        self.requests.put(key)
+        return d
+
+    def cached(self, host, port, family=socket.AF_UNSPEC,
+               kind=socket.SOCK_STREAM):
+        """Return the addresses of a numeric or cached host straight away,
+        or None if it has to be resolved.
+
+        """
+        key = (host, port, family, kind)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > self.loop.now():
+            self.hits += 1
+            return list(cached[1])
+
+        try:
+            infos = socket.getaddrinfo(host, port, family, kind, 0,
+                                       socket.AI_NUMERICHOST)
+        except socket.gaierror:
+            return None
+        return _interleave(infos)
+
+    def clear(self):
+        """Forget every cached result."""
+        self.cache.clear()
+
+    def close(self):
+        """Stop the resolver threads once they are done."""
+        for thread in self.threads:
+            self.requests.put(None)
+        self.threads = []
+        if self.async_watcher.active:
+            self.async_watcher.stop()
+
+    def _work(self):
+        """Resolve requests until told to stop, run by each thread."""
+        while True:
+            key = self.requests.get()
+            if key is None:
+                return
+            try:
+                result = socket.getaddrinfo(*key)
+            except Exception as e:
+                result = e
+            self.results.append((key, result))
+            self.async_watcher.send()
+
+    def _deliver(self, watcher, events):
+        """Called by the pyev watcher (self.async_watcher) in the loop thread
+        to hand results to their deferreds.
+
+        """
+        while self.results:
+            key, result = self.results.popleft()
+            deferreds = self.pending.pop(key, ())
+            if isinstance(result, Exception):
+                logger.warn("resolving {} failed, reason {}".format(key[0],
+                                                                    result))
+                for d in deferreds:
+                    d.errback(result)
+                continue
+            addresses = _interleave(result)
+            self.cache[key] = (self.loop.now() + self.ttl, addresses)
+            for d in deferreds:
+                d.callback(list(addresses))
+        if not self.pending and watcher.active:
+            watcher.stop()
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import random
+import logbook
+import pyev
+
+from whizzer.defer import Deferred
+from whizzer.timer import TimerWheel
+from whizzer.client import Backoff, TimeoutError
+from whizzer.transport import ConnectionClosed
+
+logger = logbook.Logger(__name__)
+
+#: send each call to the endpoint with the fewest outstanding requests
+LEAST_OUTSTANDING = 'least_outstanding'
+
+#: pick two endpoints at random and send the call to the one with the lower
+#: latency weighted by its outstanding requests
+POWER_OF_TWO = 'power_of_two'
+
+#: weight of the latest call in the latency moving average
+LATENCY_WEIGHT = 0.3
+
+
+class NoEndpointsError(Exception):
+    """Raised when a balanced proxy has no endpoint able to take a call."""
+
+
+class Endpoint(object):
+    """One service instance behind a BalancedProxy."""
+
+    def __init__(self, balancer, client):
+        """Endpoint
+
+        balancer -- the BalancedProxy
+        client -- SocketClient connecting to the instance with an rpc
+                  protocol factory
+
+        """
+        self.balancer = balancer
+        self.loop = balancer.loop
+        self.client = client
+        self.client.lost_cb = self._lost
+        self.client.sigint_watcher.stop()
+        self.proxy = None
+        self.connecting = False
+        self.ejected = False
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        self.calls = 0
+        self.errors = 0
+        self.ejections = 0
+        self.pending = set()
+        self.backoff = Backoff(initial=balancer.eject_time,
+                               maximum=balancer.max_eject_time)
+        self.probe_watcher = pyev.Timer(0.0, 0.0, self.loop, self._probe)
+
+    def available(self):
+        return self.proxy is not None and not self.ejected
+
+    def score(self):
+        """Expected cost of another call, for POWER_OF_TWO."""
+        return (self.latency or 0.0) * (self.outstanding + 1)
+
+    def connect(self):
+        if self.connecting or self.proxy is not None:
+            return
+        self.connecting = True
+        self.client.connect(self.balancer.connect_timeout).add_callbacks(
+            self._connected, self._failed)
+
+    def close(self):
+        if self.probe_watcher.active:
+            self.probe_watcher.stop()
+        self.client.lost_cb = None
+        if self.client.connection:
+            self.client.disconnect()
+        self._fail_pending(ConnectionClosed())
+        self.proxy = None
+
+    def _connected(self, protocol):
+        self.connecting = False
+        protocol.proxy().add_callback(self._bound)
+
+    def _bound(self, proxy):
+        self.proxy = proxy
+        if self.ejected:
+            self._readmit()
+
+    def _failed(self, reason):
+        self.connecting = False
+        logger.warn("endpoint connect failed, reason {}".format(reason))
+        self.eject()
+
+    def _lost(self, client, reason):
+        """Called by the client when the connection has been lost."""
+        self.proxy = None
+        self._fail_pending(ConnectionClosed())
+        self.eject()
+
+    def _fail_pending(self, reason):
+        pending = self.pending
+        self.pending = set()
+        for d in pending:
+            if not d.called:
+                d.errback(reason)
+
+    def begin_call(self, method, args):
+        """Send a call, returns a deferred of its result."""
+        d = Deferred(self.loop)
+        self.pending.add(d)
+        self.outstanding += 1
+        self.calls += 1
+        start = self.loop.now()
+        timeout = None
+        if self.balancer.call_timeout:
+            timeout = TimerWheel.for_loop(self.loop).timeout(
+                lambda: self._timed_out(d))
+            timeout.schedule(start + self.balancer.call_timeout)
+        try:
+            inner = self.proxy.begin_call(method, *args)
+        except ConnectionClosed as e:
+            self._done(d, timeout)
+            self.errors += 1
+            self._failure()
+            d.errback(e)
+            return d
+        inner.add_callbacks(self._returned, self._raised,
+                            callback_args=(d, start, timeout),
+                            errback_args=(d, start, timeout))
+        return d
+
+    def _done(self, d, timeout):
+        self.pending.discard(d)
+        self.outstanding -= 1
+        if timeout:
+            timeout.cancel()
+
+    def _returned(self, result, d, start, timeout):
+        if d.called:
+            return
+        self._done(d, timeout)
+        self._succeeded(self.loop.now() - start)
+        d.callback(result)
+
+    def _raised(self, error, d, start, timeout):
+        if d.called:
+            return
+        self._done(d, timeout)
+        # the instance answered, a remote exception says nothing of its health
+        self._succeeded(self.loop.now() - start)
+        self.errors += 1
+        d.errback(error)
+
+    def _timed_out(self, d):
+        if d.called:
+            return
+        self._done(d, None)
+        self.errors += 1
+        self._failure()
+        d.errback(TimeoutError())
+
+    def _succeeded(self, latency):
+        self.failures = 0
+        self.backoff.reset()
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_WEIGHT * (latency - self.latency)
+
+    def _failure(self):
+        self.failures += 1
+        if self.failures >= self.balancer.max_failures:
+            self.eject()
+
+    def eject(self):
+        """Stop routing calls here until a probe brings the endpoint back."""
+        if not self.ejected:
+            self.ejected = True
+            self.ejections += 1
+            logger.warn("ejected endpoint {}".format(self.client.addr))
+        if self.balancer.closing or self.probe_watcher.active:
+            return
+        self.probe_watcher.set(self.backoff.next(), 0.0)
+        self.probe_watcher.start()
+
+    def _probe(self, watcher, events):
+        """Called by the pyev watcher (self.probe_watcher) to try an ejected
+        endpoint again.
+
+        """
+        if self.proxy is None:
+            self.connect()
+        else:
+            self._readmit()
+
+    def _readmit(self):
+        """Route calls here again, on probation, one more failure ejects it
+        again for longer.
+
+        """
+        self.ejected = False
+        self.failures = self.balancer.max_failures - 1
+        logger.info("readmitted endpoint {}".format(self.client.addr))
+
+    def stats(self):
+        return {'address': self.client.addr,
+                'connected': self.proxy is not None,
+                'ejected': self.ejected,
+                'outstanding': self.outstanding,
+                'latency': self.latency,
+                'calls': self.calls,
+                'errors': self.errors,
+                'ejections': self.ejections}
+
+
+class BalancedProxy(object):
+    """Proxy spreading calls over several instances of a service.
+
+    Each call goes to the instance with the fewest outstanding requests
+    (LEAST_OUTSTANDING) or to the better of two chosen at random by
+    latency (POWER_OF_TWO). Instances that time out or cannot be reached
+    max_failures times in a row are ejected and probed again after a
+    growing delay, the first call after they come back decides whether they
+    stay.
+
+    """
+
+    def __init__(self, loop, clients, strategy=LEAST_OUTSTANDING,
+                 call_timeout=None, connect_timeout=5.0, max_failures=3,
+                 eject_time=1.0, max_eject_time=60.0):
+        """BalancedProxy
+
+        loop -- pyev loop
+        clients -- a SocketClient per instance, each built with its own rpc
+                   protocol factory (MsgPackProtocolFactory for example)
+        strategy -- LEAST_OUTSTANDING or POWER_OF_TWO
+        call_timeout -- optional seconds after which a call fails with a
+                        TimeoutError and counts against its endpoint
+        connect_timeout -- seconds allowed for each connect
+        max_failures -- failures in a row after which an endpoint is ejected
+        eject_time -- seconds before an ejected endpoint is first probed
+        max_eject_time -- longest an endpoint stays ejected between probes
+
+        """
+        self.loop = loop
+        self.strategy = strategy
+        self.call_timeout = call_timeout
+        self.connect_timeout = connect_timeout
+        self.max_failures = max_failures
+        self.eject_time = eject_time
+        self.max_eject_time = max_eject_time
+        self.closing = False
+        self.timeout = None
+        self.endpoints = [Endpoint(self, client) for client in clients]
+
+    def connect(self):
+        """Connect to every endpoint."""
+        for endpoint in self.endpoints:
+            endpoint.connect()
+
+    def close(self):
+        """Disconnect from every endpoint."""
+        self.closing = True
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    def set_timeout(self, timeout):
+        """Set the timeout of blocking calls, None means block forever."""
+        self.timeout = timeout
+
+    def choose(self):
+        """Return the endpoint the next call should go to.
+
+        Raises NoEndpointsError if none is available.
+
+        """
+        available = [e for e in self.endpoints if e.available()]
+        if not available:
+            raise NoEndpointsError()
+        if self.strategy == POWER_OF_TWO and len(available) > 1:
+            first, second = random.sample(available, 2)
+            return first if first.score() <= second.score() else second
+        return min(available, key=lambda e: e.outstanding)
+
+    def call(self, method, *args):
+        """Perform a synchronous remote call, see Proxy.call."""
+        return self.begin_call(method, *args).result(self.timeout)
+
+    def notify(self, method, *args):
+        """Perform a remote call where no return value is desired."""
+        self.choose().proxy.notify(method, *args)
+
+    def begin_call(self, method, *args):
+        """Perform an asynchronous remote call on the chosen endpoint.
+
+        Returns a Deferred, errbacked with NoEndpointsError if no endpoint
+        is available.
+
+        """
+        try:
+            endpoint = self.choose()
+        except NoEndpointsError as e:
+            d = Deferred(self.loop)
+            d.errback(e)
+            return d
+        return endpoint.begin_call(method, args)
+
+    def stats(self):
+        """Return a list of dicts describing each endpoint."""
+        return [endpoint.stats() for endpoint in self.endpoints]
@@ -74,7 +74,10 @@ class MsgPackProxy(Proxy):
         This may block for sometime in certain situations. If it takes more than the Proxies
         set timeout then a TimeoutError is raised.
 
+        If the connection is backed up this waits for it to drain first.
+
         """
+        self.wait_writable()
         self.protocol.send_notification(method, args)
 
     def begin_call(self, method, *args):
@@ -100,10 +103,26 @@ class MsgPackProxy(Proxy):
         del self.requests[msgid]
 
 class MsgPackProtocol(Protocol):
-    def __init__(self, loop, factory, dispatch=Dispatch()):
+
+    # the unpacker copies whatever it is fed
+    read_views = True
+
+    def __init__(self, loop, factory, dispatch=Dispatch(), max_pending=None):
+        """MsgPackProtocol
+
+        loop -- A pyev loop.
+        factory -- The MsgPackProtocolFactory that built this protocol.
+        dispatch -- Dispatch used to handle incoming requests.
+        max_pending -- optional number of deferred requests after which
+                       reading from the connection is paused.
+
+        """
         Protocol.__init__(self, loop)
         self.factory = factory
         self.dispatch = dispatch
+        self.max_pending = max_pending
+        self.pending = 0
+        self.reading_paused = False
         self._proxy = None
         self._proxy_deferreds = []
         self.handlers = {0:self.request, 1:self.response, 2:self.notify}
@@ -138,9 +157,37 @@ class MsgPackProtocol(Protocol):
         if isinstance(result, Deferred):
             result.add_callback(self._result, msgid)
             result.add_errback(self._error, msgid)
+            if not result.called:
+                self._track(result)
         else:
             self.send_response(msgid, error, result)
 
+    def _track(self, d):
+        """Count a deferred request, pausing reading once there are
+        max_pending of them.
+
+        """
+        self.pending += 1
+        if self.max_pending and self.pending >= self.max_pending and not self.reading_paused:
+            self.reading_paused = True
+            self.transport.pause_reading()
+        d.add_callbacks(self._untrack, self._untrack)
+
+    def _untrack(self, result):
+        """A deferred request finished, resume reading if it was paused."""
+        self.pending -= 1
+        if self.reading_paused and self.pending < self.max_pending:
+            self.reading_paused = False
+            if not self.transport.closed:
+                self.transport.resume_reading()
+                self._handle_messages()
+
+    def in_flight(self):
+        """Deferred requests being handled plus calls awaiting a response."""
+        if self._proxy:
+            return self.pending + len(self._proxy.requests)
+        return self.pending
+
     def data(self, data):
         """Use msgpack's streaming feed feature to build up a set of lists.
         
@@ -150,8 +197,17 @@ class MsgPackProtocol(Protocol):
 
         """
         self.unpacker.feed(data)
+        self._handle_messages()
+
+    def _handle_messages(self):
+        """Handle unpacked messages until none are left or reading has been
+        paused.
+
+        """
         for msg in self.unpacker:
             self.handlers[msg[0]](*msg)
+            if self.reading_paused:
+                break
 
     def _result(self, result, msgid):
         self.send_response(msgid, None, result)
@@ -188,9 +244,10 @@ class MsgPackProtocol(Protocol):
 
 
 class MsgPackProtocolFactory(ProtocolFactory):
-    def __init__(self, dispatch=Dispatch()):
+    def __init__(self, dispatch=Dispatch(), max_pending=None):
         ProtocolFactory.__init__(self)
         self.dispatch = dispatch
+        self.max_pending = max_pending
         self.protocol = MsgPackProtocol
         self.protocols = []
 
@@ -199,7 +256,7 @@ class MsgPackProtocolFactory(ProtocolFactory):
         return self.protocols[conn_number].proxy()
 
     def build(self, loop):
-        p = self.protocol(loop, self, self.dispatch)
+        p = self.protocol(loop, self, self.dispatch, self.max_pending)
         self.protocols.append(p)
         return p
 
@@ -90,7 +90,10 @@ class PickleProxy(Proxy):
         This may block for sometime in certain situations. If it takes more than the Proxies
         set timeout then a TimeoutError is raised.
 
+        If the connection is backed up this waits for it to drain first.
+
         """
+        self.wait_writable()
         self.protocol.send_notification(method, args, kwargs)
 
     def begin_call(self, method, *args, **kwargs):
@@ -118,10 +121,22 @@ class PickleProxy(Proxy):
         del self.requests[msgid]
 
 class PickleProtocol(Protocol):
-    def __init__(self, loop, factory, dispatch=Dispatch()):
+    def __init__(self, loop, factory, dispatch=Dispatch(), max_pending=None):
+        """PickleProtocol
+
+        loop -- A pyev loop.
+        factory -- The PickleProtocolFactory that built this protocol.
+        dispatch -- Dispatch used to handle incoming requests.
+        max_pending -- optional number of deferred requests after which
+                       reading from the connection is paused.
+
+        """
         Protocol.__init__(self, loop)
         self.factory = factory
         self.dispatch = dispatch
+        self.max_pending = max_pending
+        self.pending = 0
+        self.reading_paused = False
         self._proxy = None
         self._proxy_deferreds = []
         self.handlers = {0:self.handle_request, 1:self.handle_notification,
@@ -141,8 +156,14 @@ class PickleProtocol(Protocol):
 
         """
         self._buffer = self._buffer + data
+        self._handle_messages()
+
+    def _handle_messages(self):
+        """Handle buffered messages until none are left or reading has been
+        paused.
 
-        while self._data_handler():
+        """
+        while not self.reading_paused and self._data_handler():
             pass
 
     def connection_lost(self, reason=None):
@@ -182,12 +203,40 @@ class PickleProtocol(Protocol):
         if isinstance(response, Deferred):
             response.add_callback(self.send_response, msgid)
             response.add_errback(self.send_error, msgid)
+            if not response.called:
+                self._track(response)
         else:
             if exception is None:
                 self.send_response(msgid, response)
             else:
                 self.send_error(msgid, exception)
 
+    def _track(self, d):
+        """Count a deferred request, pausing reading once there are
+        max_pending of them.
+
+        """
+        self.pending += 1
+        if self.max_pending and self.pending >= self.max_pending and not self.reading_paused:
+            self.reading_paused = True
+            self.transport.pause_reading()
+        d.add_callbacks(self._untrack, self._untrack)
+
+    def _untrack(self, result):
+        """A deferred request finished, resume reading if it was paused."""
+        self.pending -= 1
+        if self.reading_paused and self.pending < self.max_pending:
+            self.reading_paused = False
+            if not self.transport.closed:
+                self.transport.resume_reading()
+                self._handle_messages()
+
+    def in_flight(self):
+        """Deferred requests being handled plus calls awaiting a response."""
+        if self._proxy:
+            return self.pending + len(self._proxy.requests)
+        return self.pending
+
     def handle_notification(self, msgtype, method, args, kwargs):
         """Handle a notification."""
         self.dispatch.call(method, args, kwargs)
@@ -237,9 +286,10 @@ class PickleProtocol(Protocol):
 
 
 class PickleProtocolFactory(ProtocolFactory):
-    def __init__(self, dispatch=Dispatch()):
+    def __init__(self, dispatch=Dispatch(), max_pending=None):
         ProtocolFactory.__init__(self)
         self.dispatch = dispatch
+        self.max_pending = max_pending
         self.protocol = PickleProtocol
         self.protocols = []
 
@@ -248,7 +298,7 @@ class PickleProtocolFactory(ProtocolFactory):
         return self.protocols[conn_number].proxy()
 
     def build(self, loop):
-        p = self.protocol(loop, self, self.dispatch)
+        p = self.protocol(loop, self, self.dispatch, self.max_pending)
         self.protocols.append(p)
         return p
 
@@ -20,6 +20,7 @@
 # THE SOFTWARE.
 
 import logbook 
+import pyev
 
 from whizzer.defer import Deferred
 
@@ -84,4 +85,16 @@ class Proxy(object):
             self.requests[msgid].callback(result)
         del self.requests[msgid]
 
+    def wait_writable(self):
+        """Run the loop until the protocol may write again.
+
+        Returns straight away unless the transport has asked the protocol
+        to pause writing, in which case the loop runs until its buffer has
+        drained or the connection is gone.
+
+        """
+        protocol = self.protocol
+        while protocol.writing_paused and not protocol.transport.closed:
+            self.loop.start(pyev.EVRUN_ONCE)
+
 
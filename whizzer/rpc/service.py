@@ -27,7 +27,7 @@ import logbook
 
 from whizzer.process import Process
 from whizzer.server import UnixServer
-from whizzer.client import UnixClient
+from whizzer.client import UnixClient, ReconnectingClient, QUEUE
 
 from whizzer.rpc.dispatch import remote, ObjectDispatch
 from whizzer.rpc.msgpackrpc import MsgPackProtocolFactory
@@ -48,33 +48,70 @@ def service(cls, loop, name, path, *args, **kwargs):
 class ServiceProxy(object):
     """Proxy to a service."""
 
-    def __init__(self, loop, path):
+    def __init__(self, loop, path, reconnect=False, backoff=None,
+                 policy=QUEUE):
+        """ServiceProxy
+
+        With reconnect set the connection is kept up by a ReconnectingClient
+        and the proxy is rebound to every new connection. Calls made while
+        disconnected wait for the connection with the QUEUE policy, running
+        the loop like call does, or raise NotConnectedError with FAIL.
+
+        loop -- pyev loop
+        path -- unix socket path of the service
+        reconnect -- reconnect whenever the connection is lost
+        backoff -- optional Backoff for the reconnects
+        policy -- QUEUE or FAIL
+
+        """
         self.loop = loop
         self.path = path
         self.proxy = None
+        self.reconnect = reconnect
+        self.backoff = backoff
+        self.policy = policy
+        self.reconnecting = None
 
     def connect(self):
         self.factory = MsgPackProtocolFactory()
         self.client = UnixClient(self.loop, self.factory, self.path)
+        if self.reconnect:
+            self.reconnecting = ReconnectingClient(self.loop, self.client,
+                                                   self.backoff, self.policy)
+            self.reconnecting.add_reconnect_callback(self.connected)
+            return self.reconnecting.start()
         d = self.client.connect()
         d.add_callback(self.connected)
         return d
 
-    def connected(self, result=None):
-        d = self.factory.proxy(0)
+    def connected(self, protocol=None):
+        if protocol is None:
+            d = self.factory.proxy(0)
+        else:
+            d = protocol.proxy()
         d.add_callback(self.set_proxy)
+        return protocol
 
     def set_proxy(self, proxy):
         self.proxy = proxy
 
+    def _get_proxy(self):
+        """Return the proxy, waiting for the connection to come back if it
+        is being reconnected.
+
+        """
+        if self.reconnecting is not None and not self.reconnecting.connected:
+            self.reconnecting.when_connected().result()
+        return self.proxy
+
     def call(self, method, *args):
-        return self.proxy.call(method, *args)
+        return self._get_proxy().call(method, *args)
 
     def notify(self, method, *args):
-        return self.proxy.notify(method, *args)
+        return self._get_proxy().notify(method, *args)
 
     def begin_call(self, method, *args):
-        return self.proxy.begin_call(method, *args)
+        return self._get_proxy().begin_call(method, *args)
 
 
 class Service(object):
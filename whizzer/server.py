@@ -20,18 +20,42 @@
 # THE SOFTWARE.
 
 import os
+import errno
 import signal
 import socket
 import logbook
 import pyev
 
-from whizzer.transport import SocketTransport, ConnectionClosed
+from whizzer.defer import Deferred
+from whizzer.handoff import inherit
+from whizzer.timer import TimerWheel
+from whizzer.transport import SocketTransport, DatagramTransport
+from whizzer.transport import ConnectionClosed, BufferOverflowError
+from whizzer.transport import COUNTERS, EAGAIN
 
 logger = logbook.Logger(__name__)
 
+#: errno values meaning the process or system ran out of descriptors or memory
+ACCEPT_EXHAUSTED = tuple(getattr(errno, name) for name in
+    ('EMFILE', 'ENFILE', 'ENOBUFS', 'ENOMEM') if hasattr(errno, name))
+
+#: broadcast policy leaving out members whose write buffer is backed up
+SKIP = 'skip'
+
+#: broadcast policy closing members whose write buffer is backed up
+DISCONNECT = 'disconnect'
+
+#: errno values meaning a connection went away before it could be accepted
+ACCEPT_ABORTED = tuple(getattr(errno, name) for name in
+    ('ECONNABORTED', 'EPROTO', 'EINTR') if hasattr(errno, name))
+
 
 class Connection(object):
     """A connection to the server from a remote client."""
+
+    __slots__ = ('loop', 'sock', 'address', 'protocol', 'server',
+                 'transport', 'timeout')
+
     def __init__(self, loop, sock, address, protocol, server):
         """Create a server connection."""
         self.loop = loop
@@ -39,14 +63,61 @@ class Connection(object):
         self.address = address
         self.protocol = protocol
         self.server = server
-        self.transport = SocketTransport(self.loop, self.sock, self.protocol.data, self.closed)
+        self.transport = SocketTransport(self.loop, self.sock,
+            self.protocol.data, self.closed,
+            read_views=getattr(self.protocol, 'read_views', False),
+            pause_cb=self.protocol.pause_writing,
+            resume_cb=self.protocol.resume_writing,
+            cork=getattr(self.protocol, 'cork', False))
+        self.timeout = None
+        if server.idle_timeout or server.read_timeout or server.write_timeout:
+            self.timeout = TimerWheel.for_loop(self.loop).timeout(
+                self._timed_out)
 
     def make_connection(self):
         self.transport.start()
         self.protocol.make_connection(self.transport, self.address)
+        if self.timeout and not self.transport.closed:
+            self.timeout.schedule(self._deadline()[0])
+
+    def _deadline(self):
+        """Return the earliest of the server timeouts for this connection
+        and the error to close it with once reached.
+
+        """
+        transport = self.transport
+        server = self.server
+        deadlines = []
+        if server.idle_timeout:
+            deadlines.append((max(transport.last_read, transport.last_write)
+                              + server.idle_timeout, ConnectionTimeout('idle')))
+        if server.read_timeout:
+            deadlines.append((transport.last_read + server.read_timeout,
+                              ConnectionTimeout('read')))
+        if server.write_timeout:
+            if transport.write_buffer:
+                last_write = transport.last_write
+            else:
+                last_write = self.loop.now()
+            deadlines.append((last_write + server.write_timeout,
+                              ConnectionTimeout('write')))
+        return min(deadlines, key=lambda deadline: deadline[0])
+
+    def _timed_out(self):
+        """Called by the timer wheel, the connection may well have been
+        active since its timeout was scheduled.
+
+        """
+        deadline, reason = self._deadline()
+        if deadline > self.loop.now():
+            self.timeout.schedule(deadline)
+        else:
+            self.server.reap(self, reason)
 
     def closed(self, reason):
         """Callback performed when the transport is closed."""
+        if self.timeout:
+            self.timeout.cancel()
         self.server.remove_connection(self)
         self.protocol.connection_lost(reason)
         if not isinstance(reason, ConnectionClosed):
@@ -58,6 +129,18 @@ class Connection(object):
         """Close the connection."""
         self.transport.close()
 
+    def idle(self):
+        """Return True when the protocol has no work in flight and everything
+        written has been sent.
+
+        """
+        return (self.protocol.in_flight() == 0
+                and not self.transport.write_buffer)
+
+
+class ConnectionTimeout(ConnectionClosed):
+    """Error signifying a connection was closed after a timeout."""
+
 
 class ShutdownError(Exception):
     """Error signifying the server has already been shutdown and cannot be
@@ -65,26 +148,95 @@ class ShutdownError(Exception):
 
 class SocketServer(object):
     """A socket server."""
-    def __init__(self, loop, factory, sock, address):
+    def __init__(self, loop, factory, sock, address, options=None,
+                 accept_batch=64, accept_retry=0.1, max_connections=None,
+                 low_water=None, accept_rate=None, accept_burst=None,
+                 refuse=False, idle_timeout=None, read_timeout=None,
+                 write_timeout=None):
         """Socket server listens on a given socket for incoming connections.
         When a new connection is available it accepts it and creates a new
         Connection and Protocol to handle reading and writting data.
 
+        Each time the socket is readable up to accept_batch connections are
+        accepted. If the process runs out of file descriptors accepting stops
+        for accept_retry seconds rather than shutting the server down.
+
+        Once max_connections are open accepting stops until the number of
+        connections drops to low_water, waiting connections are left in the
+        listen backlog. With refuse set they are accepted and closed straight
+        away instead. Accepts may also be limited to accept_rate per second
+        with bursts of up to accept_burst.
+
+        Connections are closed with a ConnectionTimeout once idle_timeout
+        seconds pass without reading or sending, read_timeout seconds pass
+        without reading, or write_timeout seconds pass without sending while
+        there is buffered data. The timeouts share the loop TimerWheel.
+
         loop -- pyev loop
         factory -- protocol factory (object with build(loop) method that returns a protocol object)
         sock -- socket to listen on
+        options -- optional SocketOptions applied to every accepted socket
+        accept_batch -- maximum connections accepted per readable event
+        accept_retry -- seconds to wait before accepting again when out of
+                        file descriptors
+        max_connections -- optional limit on open connections
+        low_water -- connections at which accepting resumes after reaching
+                     max_connections, defaults to nine tenths of it
+        accept_rate -- optional limit on accepts per second
+        accept_burst -- accepts allowed in a burst, defaults to accept_batch
+        refuse -- close connections over max_connections rather than leaving
+                  them in the backlog
+        idle_timeout -- optional seconds a connection may be inactive
+        read_timeout -- optional seconds a connection may go without reading
+        write_timeout -- optional seconds buffered data may go unsent
 
         """
         self.loop = loop
         self.factory = factory
         self.sock = sock
         self.address = address
+        self.options = options
         self.connections = set()
+        self.accept_batch = accept_batch
+        self.totals = dict()
+        self.accepted = 0
+        self.exhausted = 0
+        self.max_connections = max_connections
+        if max_connections and low_water is None:
+            low_water = max_connections * 9 // 10
+        self.low_water = low_water
+        self.accept_rate = accept_rate
+        self.accept_burst = accept_burst or accept_batch
+        self.tokens = self.accept_burst
+        self.refill = self.loop.now()
+        self.refuse = refuse
+        self.deferred = 0
+        self.refused = 0
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.reaped = 0
+        self.groups = dict()
+        self.memberships = dict()
+        self.broadcasts = 0
+        self.broadcast_skipped = 0
+        self.broadcast_dropped = 0
+        self.listening = False
+        self._exhausted = False
+        self._full = False
+        self._throttled = False
         self._closing = False
         self._shutdown = False
+        self._drained = None
+        self.drain_deadline = None
         self.interrupt_watcher = pyev.Signal(signal.SIGINT, self.loop, self._interrupt)
         self.interrupt_watcher.start()
-        self.read_watcher = pyev.Io(self.sock, pyev.EV_READ, self.loop, self._readable)
+        self.read_watcher = pyev.Io(self.sock, pyev.EV_READ, self.loop,
+                                    self._readable, self.sock)
+        self.listeners = [self.read_watcher]
+        self.retry_watcher = pyev.Timer(accept_retry, 0.0, self.loop, self._retry)
+        self.throttle_watcher = pyev.Timer(0.0, 0.0, self.loop, self._unthrottle)
+        self.drain_watcher = pyev.Timer(0.0, 0.05, self.loop, self._sweep)
 
     def start(self):
         """Start the socket server.
@@ -95,7 +247,8 @@ class SocketServer(object):
         if self._shutdown:
             raise ShutdownError()
 
-        self.read_watcher.start()
+        self.listening = True
+        self._update_accepting()
         logger.info("server started listening on {}".format(self.address))
 
     def stop(self):
@@ -109,7 +262,13 @@ class SocketServer(object):
         if self._shutdown:
             raise ShutdownError()
 
-        self.read_watcher.stop()
+        self.listening = False
+        self._update_accepting()
+        if self.retry_watcher.active:
+            self.retry_watcher.stop()
+        if self.throttle_watcher.active:
+            self.throttle_watcher.stop()
+        self._throttled = False
         logger.info("server stopped listening on {}".format(self.address))
 
     def shutdown(self, reason = ConnectionClosed()):
@@ -125,43 +284,304 @@ class SocketServer(object):
         
         self.stop()
        
+        forced = len(self.connections)
+        if self.drain_watcher.active:
+            self.drain_watcher.stop()
         self._closing = True
         for connection in self.connections:
             connection.close()
+            connection.transport.add_counters(self.totals)
         self.connections = set()
+        self.groups.clear()
+        self.memberships.clear()
         self._shutdown = True
         if isinstance(reason, ConnectionClosed):
             logger.info("server shutdown")
         else:
             logger.warn("server shutdown, reason %s" % str(reason))
+        if self._drained is not None and not self._drained.called:
+            self._drained.callback(forced)
 
     def _interrupt(self, watcher, events):
         """Handle the interrupt signal sanely."""
+        if not self._shutdown:
+            self.shutdown()
+
+    def drain(self, timeout=30.0):
+        """Shutdown the socket server gracefully.
+
+        The socket server stops accepting incoming connections, connections
+        are closed as they become idle (see Connection.idle) and any left
+        after timeout seconds are dropped.
+
+        Returns a deferred called back with the number of connections that
+        had to be dropped once the server has shutdown.
+
+        """
+        if self._shutdown:
+            raise ShutdownError()
+        if self._drained is not None:
+            return self._drained
+
+        self._drained = Deferred(self.loop)
+        self.drain_deadline = self.loop.now() + timeout
+        if self.listening:
+            self.stop()
+        logger.info("server draining {} connections".format(
+            len(self.connections)))
+        self.drain_watcher.start()
+        return self._drained
+
+    def _sweep(self, watcher, events):
+        """Called by the pyev watcher (self.drain_watcher) to close idle
+        connections while draining.
+
+        """
+        for connection in list(self.connections):
+            if connection.idle():
+                connection.close()
+        if self.connections and self.loop.now() < self.drain_deadline:
+            return
         self.shutdown()
 
+    def _update_accepting(self):
+        """Start or stop the accept watcher to match the server state."""
+        accepting = (self.listening and not self._exhausted
+                     and not self._throttled
+                     and (self.refuse or not self._full))
+        for watcher in self.listeners:
+            if accepting and not watcher.active:
+                watcher.start()
+            elif not accepting and watcher.active:
+                watcher.stop()
+
+    def _retry(self, watcher, events):
+        """Called by the pyev watcher (self.retry_watcher) to try accepting
+        again after running out of file descriptors.
+
+        """
+        self._exhausted = False
+        self._update_accepting()
+
+    def _unthrottle(self, watcher, events):
+        """Called by the pyev watcher (self.throttle_watcher) once the accept
+        rate allows accepting again.
+
+        """
+        self._throttled = False
+        self._update_accepting()
+
+    def _admit(self):
+        """Take a token for an accept, pausing accepting when there are none
+        left.
+
+        """
+        if not self.accept_rate:
+            return True
+
+        now = self.loop.now()
+        self.tokens = min(self.accept_burst,
+                          self.tokens + (now - self.refill) * self.accept_rate)
+        self.refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+
+        self.deferred += 1
+        self._throttled = True
+        self._update_accepting()
+        self.throttle_watcher.set((1 - self.tokens) / self.accept_rate, 0.0)
+        self.throttle_watcher.start()
+        return False
+
+    def add_listener(self, sock):
+        """Accept connections on another listening socket as well, sharing
+        the connections, limits and metrics of the server.
+
+        """
+        sock.setblocking(False)
+        watcher = pyev.Io(sock, pyev.EV_READ, self.loop, self._readable, sock)
+        self.listeners.append(watcher)
+        self._update_accepting()
+
+    def sockets(self):
+        """Return a list of (address, socket) for each listening socket."""
+        return [(self.address, self.sock)]
+
     def _readable(self, watcher, events):
-        """Called by the pyev watcher (self.read_watcher) whenever the socket
-        is readable.
+        """Called by the pyev watchers (self.listeners) whenever a listening
+        socket is readable.
    
-        This means either the socket has been closed or there is a new
-        client connection waiting.
+        This means either the socket has been closed or there are new
+        client connections waiting, up to accept_batch of them are accepted.
 
         """
+        listener = watcher.data
+        for x in range(self.accept_batch):
+            if not watcher.active or not self._admit():
+                return
+
+            try:
+                sock, address = listener.accept()
+            except IOError as e:
+                if e.errno in EAGAIN:
+                    return
+                elif e.errno in ACCEPT_ABORTED:
+                    continue
+                elif e.errno in ACCEPT_EXHAUSTED:
+                    logger.warn("accept failed, reason %s" % str(e))
+                    self.exhausted += 1
+                    self._exhausted = True
+                    self._update_accepting()
+                    self.retry_watcher.start()
+                else:
+                    self.shutdown(e)
+                return
+
+            if self._full:
+                self.refused += 1
+                sock.close()
+                continue
+
+            self.add_connection(sock, address)
+
+    def add_connection(self, sock, address):
+        """Build a protocol and connection for an accepted socket."""
+        if self.options:
+            self.options.apply(sock)
         protocol = self.factory.build(self.loop)
-        try:
-            sock, address = self.sock.accept()
-            connection = Connection(self.loop, sock, address, protocol, self)
-            self.connections.add(connection)
-            connection.make_connection()
-            logger.debug("added connection")
-        except IOError as e:
-            self.shutdown(e)
+        connection = Connection(self.loop, sock, address, protocol, self)
+        self.accepted += 1
+        self.connections.add(connection)
+        if (self.max_connections
+                and len(self.connections) >= self.max_connections):
+            if not self._full:
+                logger.warn("reached {} connections".format(
+                    len(self.connections)))
+                self.deferred += 1
+                self._full = True
+                self._update_accepting()
+        connection.make_connection()
+        logger.debug("added connection")
 
     def remove_connection(self, connection):
         """Called by the connections themselves when they have been closed."""
         if not self._closing:
             self.connections.remove(connection)
+            connection.transport.add_counters(self.totals)
+            self._leave_all(connection.transport)
             logger.debug("removed connection")
+            if self._full and len(self.connections) <= self.low_water:
+                self._full = False
+                self._update_accepting()
+
+    def join(self, group, transport):
+        """Add the transport of a connection to a named group.
+
+        Members leave their groups when their connection closes.
+
+        """
+        self.groups.setdefault(group, set()).add(transport)
+        self.memberships.setdefault(transport, set()).add(group)
+
+    def leave(self, group, transport):
+        """Remove the transport of a connection from a named group."""
+        members = self.groups.get(group)
+        if members is not None:
+            members.discard(transport)
+            if not members:
+                del self.groups[group]
+        names = self.memberships.get(transport)
+        if names is not None:
+            names.discard(group)
+            if not names:
+                del self.memberships[transport]
+
+    def _leave_all(self, transport):
+        """Remove a transport from every group it is in."""
+        for group in list(self.memberships.get(transport, ())):
+            self.leave(group, transport)
+
+    def members(self, group):
+        """Return an iterator over the transports in a group."""
+        return iter(list(self.groups.get(group, ())))
+
+    def broadcast(self, group, payload, policy=SKIP):
+        """Write payload to every member of a group.
+
+        The payload is encoded once by the caller and shared by reference by
+        every write buffer it ends up in, bytes or a read only memoryview
+        are never copied.
+
+        Members whose write buffer is over its high water mark, or would
+        overflow, are left out with the SKIP policy or closed with a
+        BufferOverflowError with the DISCONNECT policy, they never hold up
+        the rest.
+
+        Returns the number of members written to.
+
+        group -- name of the group
+        payload -- bytes to write
+        policy -- SKIP or DISCONNECT
+
+        """
+        self.broadcasts += 1
+        written = 0
+        size = len(payload)
+        for transport in list(self.groups.get(group, ())):
+            if transport.closed:
+                continue
+            if (transport.write_paused or
+                    transport.write_buffer_size + size > transport.max_size):
+                self._slow(transport, policy)
+                continue
+            try:
+                transport.write(payload)
+                written += 1
+            except BufferOverflowError:
+                self._slow(transport, policy)
+            except ConnectionClosed:
+                pass
+        return written
+
+    def _slow(self, transport, policy):
+        """Apply the broadcast policy to a member that cannot keep up."""
+        if policy == DISCONNECT:
+            self.broadcast_dropped += 1
+            transport.close(BufferOverflowError())
+        else:
+            self.broadcast_skipped += 1
+
+    def reap(self, connection, reason):
+        """Called by a connection that has timed out."""
+        self.reaped += 1
+        logger.debug("reaped connection, {}".format(reason))
+        connection.transport.close(reason)
+
+    def snapshot(self):
+        """Return a dict of the server metrics.
+
+        The transport counters (see whizzer.transport.COUNTERS) are summed
+        over every connection the server has had, peak_buffer is the largest
+        write buffer any of them reached.
+
+        """
+        totals = dict(self.totals)
+        for connection in self.connections:
+            connection.transport.add_counters(totals)
+        for name in COUNTERS:
+            totals.setdefault(name, 0)
+        totals.setdefault('peak_buffer', 0)
+        totals['connections'] = len(self.connections)
+        totals['accepted'] = self.accepted
+        totals['exhausted'] = self.exhausted
+        totals['deferred'] = self.deferred
+        totals['refused'] = self.refused
+        totals['reaped'] = self.reaped
+        totals['broadcasts'] = self.broadcasts
+        totals['broadcast_skipped'] = self.broadcast_skipped
+        totals['broadcast_dropped'] = self.broadcast_dropped
+        return totals
 
 class _PathRemoval(object):
     """Remove a path when the object dies.
@@ -173,35 +593,213 @@ class _PathRemoval(object):
         self.path = path
 
     def __del__(self):
-        if os.path.exists(self.path):
+        if self.path and os.path.exists(self.path):
             os.unlink(self.path)
 
 class UnixServer(SocketServer):
     """A unix server is a socket server that listens on a domain socket."""
-    def __init__(self, loop, factory, path, backlog=256):
+    def __init__(self, loop, factory, path, backlog=256, options=None,
+                 **kwargs):
+        """Remaining keyword arguments are passed on to SocketServer.
+
+        A listening socket for path handed down by a predecessor (see
+        whizzer.handoff) is used rather than binding a new one.
+
+        """
         self.address = path
         self.path_removal = _PathRemoval(self.address)
-        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.sock.bind(path)
-        self.sock.listen(backlog)
+        self.sock = inherit(self.address, socket.AF_UNIX)
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if options:
+                options.apply_listener(self.sock)
+            self.sock.bind(path)
+            self.sock.listen(backlog)
         self.sock.setblocking(False)
-        SocketServer.__init__(self, loop, factory, self.sock, self.address)
+        SocketServer.__init__(self, loop, factory, self.sock, self.address,
+                              options, **kwargs)
 
-    def shutdown(self):
+    def shutdown(self, reason = ConnectionClosed()):
         """Shutdown the socket unix socket server ensuring the unix socket is
         removed.
         
         """
-        err = None
-        SocketServer.shutdown(self)
+        SocketServer.shutdown(self, reason)
+
+    def keep_path(self):
+        """Leave the unix socket in place when the server goes away, for
+        when a successor process has inherited it.
+
+        """
+        self.path_removal.path = None
 
 class TcpServer(SocketServer):
     """A tcp server is a socket server that listens on a internet socket."""
-    def __init__(self, loop, factory, host, port, backlog=256):
+    def __init__(self, loop, factory, host, port, backlog=256, options=None,
+                 **kwargs):
+        """Remaining keyword arguments are passed on to SocketServer.
+
+        A listening socket for (host, port) handed down by a predecessor (see
+        whizzer.handoff) is used rather than binding a new one.
+
+        """
         self.address = (host, port)
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock = inherit(self.address, socket.AF_INET)
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if options:
+                options.apply_listener(self.sock)
+            self.sock.bind((host, port))
+            self.sock.listen(backlog)
+        self.sock.setblocking(False)
+        SocketServer.__init__(self, loop, factory, self.sock, self.address,
+                              options, **kwargs)
+
+class MultiTcpServer(SocketServer):
+    """A tcp server listening on several addresses, IPv4 and IPv6 alike.
+
+    Every listening socket shares one accept path, connection set and set of
+    metrics.
+
+    """
+    def __init__(self, loop, factory, addresses, backlog=256, options=None,
+                 **kwargs):
+        """Each (host, port) in addresses is resolved with getaddrinfo and
+        every address it resolves to is listened on, IPv6 sockets are bound
+        with IPV6_V6ONLY so that "::" and "0.0.0.0" can be listened on
+        together. A host of None means every local address.
+
+        Remaining keyword arguments are passed on to SocketServer.
+
+        """
+        listening = []
+        for host, port in addresses:
+            for family, kind, proto, name, address in socket.getaddrinfo(
+                    host, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0,
+                    socket.AI_PASSIVE):
+                address = address[:2]
+                if address in [bound for bound, sock in listening]:
+                    continue
+                sock = inherit(address, family)
+                if sock is None:
+                    sock = self._listen(family, address, backlog, options)
+                listening.append((address, sock))
+        if not listening:
+            raise socket.error("no addresses to listen on")
+
+        self.listening_sockets = listening
+        self.sock = listening[0][1]
+        self.sock.setblocking(False)
+        SocketServer.__init__(self, loop, factory, self.sock,
+                              [address for address, sock in listening],
+                              options, **kwargs)
+        for address, sock in listening[1:]:
+            self.add_listener(sock)
+
+    def _listen(self, family, address, backlog, options):
+        """Create a socket listening on address."""
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if family == socket.AF_INET6 and hasattr(socket, 'IPV6_V6ONLY'):
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        if options:
+            options.apply_listener(sock)
+        sock.bind(address)
+        sock.listen(backlog)
+        return sock
+
+    def sockets(self):
+        """Return a list of (address, socket) for each listening socket."""
+        return list(self.listening_sockets)
+
+
+class DatagramServer(object):
+    """A datagram server, a single protocol handles every datagram."""
+    def __init__(self, loop, factory, sock, address):
+        """Datagram server receives datagrams on a given socket and hands them
+        to a protocol built when the server is created.
+
+        loop -- pyev loop
+        factory -- protocol factory, building a DatagramProtocol
+        sock -- bound socket to receive on
+
+        """
+        self.loop = loop
+        self.factory = factory
+        self.sock = sock
+        self.address = address
+        self._shutdown = False
+        self.interrupt_watcher = pyev.Signal(signal.SIGINT, self.loop, self._interrupt)
+        self.interrupt_watcher.start()
+        self.protocol = self.factory.build(self.loop)
+        self.transport = DatagramTransport(self.loop, self.sock,
+            self.protocol.datagram_received, self.closed,
+            error_cb=self.protocol.error_received,
+            read_views=getattr(self.protocol, 'read_views', False))
+        self.protocol.make_connection(self.transport, self.address)
+
+    def start(self):
+        """Start the datagram server receiving datagrams."""
+        if self._shutdown:
+            raise ShutdownError()
+
+        self.transport.start()
+        logger.info("server started listening on {}".format(self.address))
+
+    def stop(self):
+        """Stop the datagram server receiving datagrams."""
+        if self._shutdown:
+            raise ShutdownError()
+
+        self.transport.stop()
+        logger.info("server stopped listening on {}".format(self.address))
+
+    def shutdown(self):
+        """Shutdown the datagram server closing its socket."""
+        if self._shutdown:
+            raise ShutdownError()
+
+        self.transport.close()
+
+    def closed(self, reason):
+        """Callback performed when the transport is closed."""
+        self._shutdown = True
+        self.protocol.connection_lost(reason)
+        if isinstance(reason, ConnectionClosed):
+            logger.info("server shutdown")
+        else:
+            logger.warn("server shutdown, reason %s" % str(reason))
+
+    def _interrupt(self, watcher, events):
+        """Handle the interrupt signal sanely."""
+        if not self._shutdown:
+            self.shutdown()
+
+    def snapshot(self):
+        """Return a dict of the transport counters."""
+        totals = dict()
+        self.transport.add_counters(totals)
+        return totals
+
+class UnixDatagramServer(DatagramServer):
+    """A unix datagram server receives datagrams on a domain socket."""
+    def __init__(self, loop, factory, path, options=None):
+        self.address = path
+        self.path_removal = _PathRemoval(self.address)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        if options:
+            options.apply_listener(self.sock)
+        self.sock.bind(path)
+        DatagramServer.__init__(self, loop, factory, self.sock, self.address)
+
+class UdpServer(DatagramServer):
+    """A udp server receives datagrams on an internet socket."""
+    def __init__(self, loop, factory, host, port, options=None):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if options:
+            options.apply_listener(self.sock)
         self.sock.bind((host, port))
-        self.sock.listen(backlog)
-        self.sock.setblocking(False)
-        SocketServer.__init__(self, loop, factory, self.sock, self.address)
+        DatagramServer.__init__(self, loop, factory, self.sock, self.address)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import socket
+
+
+#: families the tcp level options apply to
+INET_FAMILIES = (socket.AF_INET, getattr(socket, 'AF_INET6', socket.AF_INET))
+
+
+class SocketOptions(object):
+    """Socket options applied to listening, accepted and connected sockets.
+
+    Every option defaults to None meaning the system default is left alone.
+    Options the platform does not know about are silently skipped, tcp level
+    options are skipped for unix sockets.
+
+    """
+
+    def __init__(self, nodelay=None, keepalive=None, keepidle=None,
+                 keepintvl=None, keepcnt=None, sndbuf=None, rcvbuf=None,
+                 quickack=None, defer_accept=None, reuseport=None):
+        """SocketOptions
+
+        nodelay -- disable Nagle's algorithm (TCP_NODELAY)
+        keepalive -- enable keepalive probes (SO_KEEPALIVE)
+        keepidle -- seconds idle before keepalive probes start (TCP_KEEPIDLE)
+        keepintvl -- seconds between keepalive probes (TCP_KEEPINTVL)
+        keepcnt -- probes before the connection is dropped (TCP_KEEPCNT)
+        sndbuf -- kernel send buffer size (SO_SNDBUF)
+        rcvbuf -- kernel receive buffer size (SO_RCVBUF)
+        quickack -- ack immediately rather than delaying acks (TCP_QUICKACK)
+        defer_accept -- seconds a listener waits for data before accepting
+                        a connection (TCP_DEFER_ACCEPT)
+        reuseport -- allow several listeners on one port (SO_REUSEPORT)
+
+        """
+        self.nodelay = nodelay
+        self.keepalive = keepalive
+        self.keepidle = keepidle
+        self.keepintvl = keepintvl
+        self.keepcnt = keepcnt
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.quickack = quickack
+        self.defer_accept = defer_accept
+        self.reuseport = reuseport
+
+    def apply(self, sock):
+        """Apply the options to an accepted or connecting socket."""
+        self._set(sock, socket.SOL_SOCKET, 'SO_SNDBUF', self.sndbuf)
+        self._set(sock, socket.SOL_SOCKET, 'SO_RCVBUF', self.rcvbuf)
+        if sock.family not in INET_FAMILIES:
+            return
+        self._set(sock, socket.SOL_SOCKET, 'SO_KEEPALIVE', self.keepalive)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_NODELAY', self.nodelay)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_KEEPIDLE', self.keepidle)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_KEEPINTVL', self.keepintvl)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_KEEPCNT', self.keepcnt)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_QUICKACK', self.quickack)
+
+    def apply_listener(self, sock):
+        """Apply the options to a listening socket before it is bound.
+
+        The buffer sizes are set here as well so accepted sockets inherit
+        them with a matching tcp window.
+
+        """
+        self._set(sock, socket.SOL_SOCKET, 'SO_SNDBUF', self.sndbuf)
+        self._set(sock, socket.SOL_SOCKET, 'SO_RCVBUF', self.rcvbuf)
+        if sock.family not in INET_FAMILIES:
+            return
+        self._set(sock, socket.SOL_SOCKET, 'SO_REUSEPORT', self.reuseport)
+        self._set(sock, socket.IPPROTO_TCP, 'TCP_DEFER_ACCEPT',
+                  self.defer_accept)
+
+    def _set(self, sock, level, name, value):
+        """Set a single option if it was given and the platform has it."""
+        if value is None or not hasattr(socket, name):
+            return
+        sock.setsockopt(level, getattr(socket, name), int(value))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import gc
+import socket
+import unittest
+import pyev
+
+from whizzer.acceptor import AcceptorServer, AcceptorWorker, WorkerChannel, REPORT
+from mocks import *
+from common import loop
+
+fpath = os.path.dirname(__file__)
+
+class TestWorkerChannel(unittest.TestCase):
+    def test_load(self):
+        channel = WorkerChannel(loop, None)
+        channel.sent = 3
+        channel.data(REPORT.pack(1, 1) + REPORT.pack(2, 2)[:4])
+        self.assertEqual(channel.load(), 3)
+        channel.data(REPORT.pack(2, 2)[4:])
+        self.assertEqual(channel.load(), 3)
+
+class TestAcceptor(unittest.TestCase):
+    def setUp(self):
+        self.path = fpath + "/test_listen"
+        self.control = fpath + "/test_control"
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(16)
+        self.sock.setblocking(False)
+        self.acceptor = AcceptorServer(loop, self.sock, self.path, self.control)
+        self.acceptor.start()
+        self.factory = MockFactory()
+        self.factory.protocol = MockProtocol
+
+    def tearDown(self):
+        self.acceptor.shutdown()
+        self.acceptor = None
+        self.sock.close()
+        os.remove(self.path)
+        gc.collect()
+
+    def worker(self):
+        worker = AcceptorWorker(loop, self.factory, self.control)
+        worker.start()
+        loop.start(pyev.EVRUN_ONCE)
+        return worker
+
+    def c_connect(self):
+        csock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        csock.connect(self.path)
+        return csock
+
+    def test_hand_off(self):
+        worker = self.worker()
+        self.assertEqual(len(self.acceptor.workers), 1)
+        csock = self.c_connect()
+        loop.start(pyev.EVRUN_ONCE)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(self.acceptor.handed_off, 1)
+        self.assertEqual(len(worker.connections), 1)
+        worker.shutdown()
+
+    def test_least_connections(self):
+        workers = [self.worker(), self.worker()]
+        csocks = [self.c_connect() for x in range(4)]
+        for x in range(4):
+            loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual([len(w.connections) for w in workers], [2, 2])
+        for worker in workers:
+            worker.shutdown()
+
+    def test_no_workers(self):
+        csock = self.c_connect()
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(self.acceptor.refused, 1)
+        self.assertEqual(csock.recv(1), b'')
+
+if __name__ == '__main__':
+    unittest.main()
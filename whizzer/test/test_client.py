@@ -26,9 +26,11 @@ import socket
 
 import pyev
 
-from whizzer.defer import Deferred
+from whizzer.defer import Deferred, CancelledError
 from whizzer.protocol import Protocol, ProtocolFactory
-from whizzer.client import TcpClient, UnixClient
+from whizzer.client import TcpClient, UnixClient, ConnectionPool, ROUND_ROBIN
+from whizzer.client import Backoff, ReconnectingClient, NotConnectedError, FAIL
+from whizzer.client import Connector
 from mocks import *
 from common import loop
 
@@ -167,5 +169,144 @@ class TestTcpClient(unittest.TestCase):
         self.client.disconnect()
         self.assertTrue(self.client.connection is None)
 
+class TestConnector(unittest.TestCase):
+    def setUp(self):
+        self.ssock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.ssock.bind(("127.0.0.1", 0))
+        self.ssock.listen(5)
+        self.addr = self.ssock.getsockname()
+        # bound but not listening, connects to it are refused
+        self.closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.closed.bind(("127.0.0.1", 0))
+
+    def tearDown(self):
+        self.ssock.close()
+        self.closed.close()
+
+    def test_refused(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connector = Connector(loop, sock, self.closed.getsockname(), 1.0)
+        d = connector.start()
+        self.assertRaises(socket.error, d.result, 1.0)
+        self.assertTrue(connector.errored)
+
+    def test_next_address(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connector = Connector(loop, sock, self.closed.getsockname(), 1.0,
+                              [(socket.AF_INET, self.addr)])
+        d = connector.start()
+        connected = d.result(1.0)
+        self.assertEqual(connected.getpeername(), self.addr)
+        self.assertEqual(connector.addr, self.addr)
+        connected.close()
+
+    def test_cancel(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connector = Connector(loop, sock, ("10.255.255.1", 9), 1.0)
+        d = connector.start()
+        connector.cancel()
+        self.assertRaises(CancelledError, d.result, 1.0)
+        self.assertTrue(connector.cancelled)
+        self.assertEqual(connector.attempts, [])
+        self.assertFalse(connector.timeout_entry.active)
+
+class TestConnectionPool(unittest.TestCase):
+    """Functional test for ConnectionPool."""
+    def setUp(self):
+        self.path = "test_pool"
+        self.ssock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.ssock.bind(self.path)
+        self.ssock.listen(5)
+
+        self.factory = MockFactory()
+        self.factory.protocol = MockProtocol
+        self.pool = ConnectionPool(loop, self.client, size=3)
+
+    def tearDown(self):
+        self.pool.close()
+        self.ssock.close()
+        os.remove(self.path)
+        self.pool = None
+        self.ssock = None
+
+    def client(self, loop):
+        return UnixClient(loop, self.factory, self.path)
+
+    def test_start(self):
+        self.assertTrue(self.pool.start().result() is self.pool)
+        stats = self.pool.stats()
+        self.assertEqual(stats['connected'], 3)
+        self.assertEqual(stats['connects'], 3)
+
+    def test_least_in_flight(self):
+        self.pool.start().result()
+        busy = self.pool.protocols[0]
+        busy.in_flight = lambda: 5
+        for x in range(3):
+            self.assertFalse(self.pool.get() is busy)
+
+    def test_round_robin(self):
+        self.pool.selection = ROUND_ROBIN
+        self.pool.start().result()
+        handed = set(self.pool.get() for x in range(3))
+        self.assertEqual(len(handed), 3)
+
+    def test_replace_lost(self):
+        self.pool.start().result()
+        self.pool.protocols[0].lose_connection()
+        self.assertEqual(self.pool.stats()['lost'], 1)
+        self.assertEqual(len(self.pool.clients), 3)
+
+class TestBackoff(unittest.TestCase):
+    def test_capped(self):
+        backoff = Backoff(initial=1.0, maximum=4.0, jitter=False)
+        self.assertEqual([backoff.next() for x in range(4)], [1.0, 2.0, 4.0, 4.0])
+        backoff.reset()
+        self.assertEqual(backoff.next(), 1.0)
+
+    def test_jitter(self):
+        backoff = Backoff(initial=1.0, maximum=4.0)
+        for x in range(10):
+            delay = backoff.next()
+            self.assertTrue(0.5 <= delay <= 4.0)
+
+class TestReconnectingClient(unittest.TestCase):
+    """Functional test for ReconnectingClient."""
+    def setUp(self):
+        self.path = "test_reconnect"
+        self.ssock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.ssock.bind(self.path)
+        self.ssock.listen(5)
+
+        self.factory = MockFactory()
+        self.factory.protocol = MockProtocol
+        self.client = ReconnectingClient(loop,
+            UnixClient(loop, self.factory, self.path),
+            Backoff(initial=0.01, jitter=False))
+        self.protocols = []
+        self.client.add_reconnect_callback(self.protocols.append)
+
+    def tearDown(self):
+        self.client.close()
+        self.ssock.close()
+        os.remove(self.path)
+        self.client = None
+        self.ssock = None
+
+    def test_reconnect(self):
+        self.client.start().result()
+        (csock, addr) = self.ssock.accept()
+        csock.close()
+        d = Deferred(loop)
+        self.client.add_reconnect_callback(d.callback)
+        d.result(1.0)
+        self.assertEqual(len(self.protocols), 2)
+        self.assertEqual(self.client.connects, 2)
+
+    def test_fail_policy(self):
+        self.client.policy = FAIL
+        d = self.client.when_connected()
+        self.assertRaises(NotConnectedError, d.result)
+
 if __name__ == '__main__':
     unittest.main()
@@ -107,6 +107,11 @@ class TestDeferred(unittest.TestCase):
         self.deferred.errback(Exception())
         self.assertTrue(isinstance(self.result, Exception))
 
+    def test_callbacks_without_args(self):
+        self.deferred.add_callbacks(self.set_result, self.set_result)
+        self.deferred.callback(5)
+        self.assertTrue(self.result == 5)
+
     def test_cancelled(self):
         self.deferred.cancel()
         self.assertRaises(CancelledError, self.deferred.errback, Exception("testcancelled"))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import gc
+import json
+import socket
+import unittest
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.server import TcpServer, UnixServer
+from whizzer.handoff import LISTEN_FDS, inherit
+from common import loop
+
+fpath = os.path.dirname(__file__)
+
+class TestHandoff(unittest.TestCase):
+    def setUp(self):
+        self.factory = ProtocolFactory()
+        self.factory.protocol = Protocol
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+
+    def tearDown(self):
+        os.environ.pop(LISTEN_FDS, None)
+        self.sock.close()
+
+    def hand_down(self, address, sock):
+        key = '%s:%s' % address if isinstance(address, tuple) else address
+        os.environ[LISTEN_FDS] = json.dumps({key: os.dup(sock.fileno())})
+
+    def test_inherit_once(self):
+        self.hand_down(("127.0.0.1", self.port), self.sock)
+        sock = inherit(("127.0.0.1", self.port), socket.AF_INET)
+        self.assertEqual(sock.getsockname(), self.sock.getsockname())
+        self.assertEqual(inherit(("127.0.0.1", self.port), socket.AF_INET), None)
+        sock.close()
+
+    def test_tcp_server(self):
+        self.hand_down(("127.0.0.1", self.port), self.sock)
+        server = TcpServer(loop, self.factory, "127.0.0.1", self.port)
+        self.assertEqual(server.sock.getsockname(), self.sock.getsockname())
+        server.shutdown()
+
+    def test_keep_path(self):
+        path = fpath + "/test_handoff"
+        server = UnixServer(loop, self.factory, path)
+        server.keep_path()
+        server.shutdown()
+        server = None
+        gc.collect()
+        self.assertTrue(os.path.exists(path))
+        os.unlink(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import unittest
+
+import pyev
+
+from whizzer.protocol import Protocol, ProtocolFactory
+from whizzer.prefork import PreforkServer
+from common import loop
+
+
+class TestPreforkServer(unittest.TestCase):
+    def test_create(self):
+        factory = ProtocolFactory()
+        factory.protocol = Protocol
+        server = PreforkServer(loop, factory, "127.0.0.1", 2000, workers=2)
+        self.assertEqual(server.count, 2)
+        self.assertTrue(server.options.reuseport)
+
+    def test_shutdown_unstarted(self):
+        factory = ProtocolFactory()
+        factory.protocol = Protocol
+        server = PreforkServer(loop, factory, "127.0.0.1", 2000, workers=2)
+        d = server.shutdown()
+        self.assertTrue(d.called)
+
+if __name__ == '__main__':
+    unittest.main()
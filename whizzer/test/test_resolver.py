@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import socket
+import unittest
+
+from whizzer.resolver import Resolver, _interleave
+from common import loop
+
+
+class TestResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = Resolver(loop, threads=2)
+
+    def tearDown(self):
+        self.resolver.close()
+
+    def test_numeric(self):
+        d = self.resolver.resolve("127.0.0.1", 80)
+        self.assertTrue(d.called)
+        self.assertEqual(d.result(), [(socket.AF_INET, ("127.0.0.1", 80))])
+        self.assertEqual(self.resolver.lookups, 0)
+
+    def test_name(self):
+        d = self.resolver.resolve("localhost", 80)
+        addresses = d.result(5.0)
+        self.assertTrue(len(addresses) > 0)
+        self.assertEqual(self.resolver.lookups, 1)
+        d = self.resolver.resolve("localhost", 80)
+        self.assertEqual(d.result(), addresses)
+        self.assertEqual(self.resolver.hits, 1)
+
+    def test_shared_lookup(self):
+        first = self.resolver.resolve("localhost", 81)
+        second = self.resolver.resolve("localhost", 81)
+        self.assertEqual(first.result(5.0), second.result(5.0))
+        self.assertEqual(self.resolver.lookups, 1)
+
+    def test_interleave(self):
+        infos = [(socket.AF_INET6, 0, 0, '', ('::1', 80, 0, 0)),
+                 (socket.AF_INET6, 0, 0, '', ('::2', 80, 0, 0)),
+                 (socket.AF_INET, 0, 0, '', ('127.0.0.1', 80))]
+        self.assertEqual([address[0] for family, address in _interleave(infos)],
+                         ['::1', '127.0.0.1', '::2'])
+
+if __name__ == '__main__':
+    unittest.main()
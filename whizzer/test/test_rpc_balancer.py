@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import unittest
+import pyev
+
+from whizzer.server import UnixServer
+from whizzer.client import UnixClient
+from whizzer.rpc.dispatch import ObjectDispatch, remote
+from whizzer.rpc.msgpackrpc import MsgPackProtocolFactory
+from whizzer.rpc.balancer import BalancedProxy, NoEndpointsError, POWER_OF_TWO
+
+from common import loop
+
+fpath = os.path.dirname(__file__)
+
+
+class Adder(object):
+    def __init__(self):
+        self.calls = 0
+
+    @remote
+    def add(self, a, b):
+        self.calls += 1
+        return a + b
+
+
+class TestBalancedProxy(unittest.TestCase):
+    def setUp(self):
+        self.adders = [Adder(), Adder()]
+        self.paths = [fpath + "/test_balancer_%d" % x for x in range(2)]
+        self.servers = []
+        for adder, path in zip(self.adders, self.paths):
+            factory = MsgPackProtocolFactory(ObjectDispatch(adder))
+            server = UnixServer(loop, factory, path)
+            server.start()
+            self.servers.append(server)
+        clients = [UnixClient(loop, MsgPackProtocolFactory(), path)
+                   for path in self.paths]
+        self.proxy = BalancedProxy(loop, clients, max_failures=2)
+        self.proxy.connect()
+        while not all(e.available() for e in self.proxy.endpoints):
+            loop.start(pyev.EVRUN_ONCE)
+
+    def tearDown(self):
+        self.proxy.close()
+        for server in self.servers:
+            server.shutdown()
+        self.servers = None
+        self.proxy = None
+
+    def test_call(self):
+        self.assertEqual(self.proxy.call('add', 1, 2), 3)
+        self.assertEqual(sum(e.calls for e in self.proxy.endpoints), 1)
+
+    def test_least_outstanding(self):
+        calls = [self.proxy.begin_call('add', 1, 1) for x in range(4)]
+        self.assertEqual([e.outstanding for e in self.proxy.endpoints], [2, 2])
+        for d in calls:
+            d.result(1.0)
+        self.assertEqual([adder.calls for adder in self.adders], [2, 2])
+
+    def test_power_of_two(self):
+        self.proxy.strategy = POWER_OF_TWO
+        for x in range(4):
+            self.assertEqual(self.proxy.call('add', 1, 1), 2)
+        self.assertTrue(all(e.latency is not None or e.calls == 0
+                            for e in self.proxy.endpoints))
+
+    def test_eject(self):
+        endpoint = self.proxy.endpoints[0]
+        endpoint._failure()
+        endpoint._failure()
+        self.assertTrue(endpoint.ejected)
+        self.assertTrue(endpoint.probe_watcher.active)
+        for x in range(3):
+            self.assertTrue(self.proxy.choose() is self.proxy.endpoints[1])
+        endpoint._probe(None, None)
+        self.assertFalse(endpoint.ejected)
+
+    def test_no_endpoints(self):
+        for endpoint in self.proxy.endpoints:
+            endpoint.eject()
+        self.assertRaises(NoEndpointsError, self.proxy.call, 'add', 1, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,8 +27,9 @@ import select
 import unittest
 import pyev
 
-from whizzer.protocol import Protocol, ProtocolFactory
-from whizzer.server import UnixServer, TcpServer
+from whizzer.protocol import Protocol, ProtocolFactory, DatagramProtocol
+from whizzer.server import UnixServer, TcpServer, MultiTcpServer, UdpServer
+from whizzer.server import DISCONNECT
 from mocks import *
 from common import loop
 
@@ -58,7 +59,8 @@ class TestUnixServer(unittest.TestCase):
         self.server = UnixServer(loop, self.factory, self.path)
 
     def tearDown(self):
-        self.server.shutdown()
+        if not self.server._shutdown:
+            self.server.shutdown()
         self.server = None
         self.server = None
         self.factory = None
@@ -106,5 +108,185 @@ class TestUnixServer(unittest.TestCase):
         self.c_connect(csock)
         self.assertTrue(self.factory.builds == 1)
 
+    def test_accept_batch(self):
+        self.server.start()
+        csocks = [self.c_sock() for x in range(3)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 3)
+        self.assertEqual(self.factory.builds, 3)
+
+    def test_snapshot(self):
+        self.server.start()
+        csock = self.c_sock()
+        self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        csock.send(b'hello')
+        loop.start(pyev.EVRUN_ONCE)
+        stats = self.server.snapshot()
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['accepted'], 1)
+        self.assertEqual(stats['bytes_read'], 5)
+
+    def test_max_connections(self):
+        self.server.max_connections = 2
+        self.server.low_water = 1
+        self.server.start()
+        csocks = [self.c_sock() for x in range(3)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertFalse(self.server.read_watcher.active)
+        next(iter(self.server.connections)).close()
+        self.assertTrue(self.server.read_watcher.active)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual(self.server.snapshot()['deferred'], 2)
+
+    def test_refuse(self):
+        self.server.max_connections = 1
+        self.server.refuse = True
+        self.server.start()
+        csocks = [self.c_sock() for x in range(2)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.snapshot()['refused'], 1)
+
+    def test_accept_rate(self):
+        self.server.accept_rate = 1
+        self.server.accept_burst = self.server.tokens = 2
+        self.server.start()
+        csocks = [self.c_sock() for x in range(3)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertTrue(self.server.throttle_watcher.active)
+        self.assertEqual(self.server.deferred, 1)
+
+    def test_drain(self):
+        self.server.start()
+        csocks = [self.c_sock() for x in range(2)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        d = self.server.drain()
+        self.assertFalse(self.server.read_watcher.active)
+        self.assertEqual(d.result(1.0), 0)
+        self.assertEqual(len(self.server.connections), 0)
+
+    def test_drain_timeout(self):
+        self.server.start()
+        csock = self.c_sock()
+        self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        for connection in self.server.connections:
+            connection.protocol.in_flight = lambda: 1
+        d = self.server.drain(0.1)
+        self.assertEqual(d.result(1.0), 1)
+
+    def test_idle_timeout(self):
+        self.server.idle_timeout = 0.1
+        self.server.start()
+        csock = self.c_sock()
+        self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(len(self.server.connections), 1)
+        deadline = loop.now() + 2.0
+        while self.server.connections and loop.now() < deadline:
+            loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(self.server.snapshot()['reaped'], 1)
+
+    def test_broadcast(self):
+        self.server.start()
+        csocks = [self.c_sock() for x in range(2)]
+        for csock in csocks:
+            self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        for connection in self.server.connections:
+            self.server.join('news', connection.transport)
+        self.assertEqual(self.server.broadcast('news', b'hello'), 2)
+        for csock in csocks:
+            self.assertEqual(csock.recv(5), b'hello')
+
+    def test_broadcast_slow(self):
+        self.server.start()
+        csock = self.c_sock()
+        self.c_connect(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        transport = next(iter(self.server.connections)).transport
+        self.server.join('news', transport)
+        transport.write_paused = True
+        self.assertEqual(self.server.broadcast('news', b'hello'), 0)
+        self.assertEqual(self.server.broadcast_skipped, 1)
+        self.server.broadcast('news', b'hello', DISCONNECT)
+        self.assertTrue(transport.closed)
+        self.assertEqual(list(self.server.members('news')), [])
+        self.assertEqual(self.server.snapshot()['broadcast_dropped'], 1)
+
+class TestMultiTcpServer(unittest.TestCase):
+    def setUp(self):
+        self.factory = MockFactory()
+        self.factory.protocol = MockProtocol
+        self.server = MultiTcpServer(loop, self.factory,
+                                     [("127.0.0.1", 0), ("127.0.0.2", 0)])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server = None
+        self.factory = None
+
+    def test_listeners(self):
+        self.assertEqual(len(self.server.listeners), 2)
+        self.assertEqual(len(self.server.sockets()), 2)
+
+    def test_accept_all(self):
+        self.server.start()
+        csocks = []
+        for address, sock in self.server.sockets():
+            csock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            csock.connect(sock.getsockname())
+            csocks.append(csock)
+        loop.start(pyev.EVRUN_ONCE)
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(self.server.snapshot()['accepted'], 2)
+        self.server.stop()
+        for watcher in self.server.listeners:
+            self.assertFalse(watcher.active)
+
+class MockDatagramProtocol(DatagramProtocol):
+    def __init__(self, loop):
+        DatagramProtocol.__init__(self, loop)
+        self.datagrams = []
+
+    def datagram_received(self, data, address):
+        self.datagrams.append((data, address))
+
+class TestUdpServer(unittest.TestCase):
+    def setUp(self):
+        self.factory = ProtocolFactory()
+        self.factory.protocol = MockDatagramProtocol
+        self.server = UdpServer(loop, self.factory, "127.0.0.1", 0)
+        self.address = self.server.sock.getsockname()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server = None
+        self.factory = None
+
+    def test_datagram(self):
+        self.server.start()
+        csock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        csock.sendto(b'hello', self.address)
+        loop.start(pyev.EVRUN_ONCE)
+        self.assertEqual(self.server.protocol.datagrams[0][0], b'hello')
+        self.server.protocol.transport.sendto(b'world', csock.getsockname())
+        self.assertEqual(csock.recv(64), b'world')
+        csock.close()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,48 @@
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import socket
+import unittest
+
+from whizzer.sockopt import SocketOptions
+
+
+class TestSocketOptions(unittest.TestCase):
+    def test_apply(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        SocketOptions(nodelay=True, keepalive=True).apply(sock)
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        sock.close()
+
+    def test_apply_default(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        SocketOptions().apply(sock)
+        self.assertFalse(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        sock.close()
+
+    def test_apply_unix(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        SocketOptions(nodelay=True, sndbuf=65536).apply(sock)
+        sock.close()
+
+if __name__ == '__main__':
+    unittest.main()
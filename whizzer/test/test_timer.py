@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import unittest
+import pyev
+
+from whizzer.timer import TimerWheel
+from common import loop
+
+
+class TestTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimerWheel(loop, tick=0.01, slots=(4, 4, 4))
+        self.fired = []
+
+    def run_until(self, count, limit=2.0):
+        deadline = loop.now() + limit
+        while len(self.fired) < count and loop.now() < deadline:
+            loop.start(pyev.EVRUN_ONCE)
+
+    def timeout(self, name):
+        return self.wheel.timeout(lambda: self.fired.append(name))
+
+    def test_expire(self):
+        self.timeout('a').schedule(loop.now() + 0.02)
+        self.run_until(1)
+        self.assertEqual(self.fired, ['a'])
+        self.assertFalse(self.wheel.watcher.active)
+
+    def test_order(self):
+        self.timeout('b').schedule(loop.now() + 0.3)
+        self.timeout('a').schedule(loop.now() + 0.05)
+        self.timeout('c').schedule(loop.now() + 1.0)
+        self.run_until(3)
+        self.assertEqual(self.fired, ['a', 'b', 'c'])
+
+    def test_reschedule(self):
+        start = loop.now()
+        timeout = self.timeout('a')
+        timeout.schedule(start + 0.02)
+        timeout.schedule(start + 0.2)
+        self.run_until(1)
+        self.assertEqual(self.fired, ['a'])
+        self.assertTrue(loop.now() >= start + 0.2)
+
+    def test_cancel(self):
+        timeout = self.timeout('a')
+        timeout.schedule(loop.now() + 0.02)
+        timeout.cancel()
+        self.assertFalse(timeout.active)
+        self.assertEqual(self.wheel.count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,6 +27,7 @@ import unittest
 import pyev
 
 from whizzer.transport import SocketTransport, ConnectionClosed, BufferOverflowError
+from whizzer.transport import MIN_READ_SIZE, DatagramTransport
 from common import loop
 
 fpath = os.path.dirname(__file__)
@@ -70,6 +71,18 @@ class TestSocketTransport(unittest.TestCase):
         rmsg = self.csock.recv(len(msg))
         self.assertEqual(rmsg, msg)
 
+    def test_corked_write(self):
+        msg = b'hello'
+        t = SocketTransport(loop, self.ssock, self.read, self.close, cork=True)
+        t.write(msg)
+        t.write(msg)
+        self.assertEqual(t.write_buffer_size, 2*len(msg))
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(t.write_buffer_size, 0)
+        self.assertTrue(t.write == t.corked_write)
+        rmsg = self.csock.recv(2*len(msg))
+        self.assertEqual(rmsg, msg + msg)
+
     def test_close(self):
         t = SocketTransport(loop, self.ssock, self.read, self.close)
         t.close()
@@ -136,6 +149,55 @@ class TestSocketTransport(unittest.TestCase):
         loop.start(pyev.EVRUN_NOWAIT)
         self.assertTrue(t.write == t.unbuffered_write)
 
+    def test_buffered_write_queue(self):
+        t = SocketTransport(loop, self.ssock, self.read, self.close)
+        msg = b'hello'
+        while(t.write != t.buffered_write):
+            t.write(msg)
+        size = t.write_buffer_size
+        buf = bytearray(b'world')
+        t.write(buf)
+        buf[:] = b'xxxxx'
+        t.write(msg)
+        self.assertEqual(t.write_buffer_size, size + 2*len(msg))
+        self.assertEqual(bytes(t.write_buffer[-2]), b'world')
+        self.assertTrue(t.write_buffer[-1] is msg)
+
+    def test_water_marks(self):
+        events = []
+        t = SocketTransport(loop, self.ssock, self.read, self.close,
+                            high_water=1024, low_water=0,
+                            pause_cb=lambda: events.append('pause'),
+                            resume_cb=lambda: events.append('resume'))
+        count = 0
+        msg = b'hello'
+        while(t.write != t.buffered_write):
+            count += 1
+            t.write(msg)
+        self.assertEqual(events, [])
+        t.write(b'x' * 2048)
+        self.assertEqual(events, ['pause'])
+        self.assertTrue(t.write_paused)
+        self.csock.recv(count*len(msg))
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(events, ['pause', 'resume'])
+        self.assertFalse(t.write_paused)
+
+    def test_sendfile(self):
+        path = fpath + "/test_sendfile"
+        with open(path, 'wb') as f:
+            f.write(b'hello world')
+        t = SocketTransport(loop, self.ssock, self.read, self.close)
+        t.write(b'head ')
+        with open(path, 'rb') as f:
+            d = t.sendfile(f, 6)
+            t.write(b' tail')
+            loop.start(pyev.EVRUN_NOWAIT)
+            self.assertEqual(d.result(), 5)
+        os.remove(path)
+        self.assertEqual(self.csock.recv(64), b'head world tail')
+        self.assertTrue(t.write == t.unbuffered_write)
+
     def test_overflow_write(self):
         t = SocketTransport(loop, self.ssock, self.read, self.close)
         self.assertRaises(BufferOverflowError, t.write, bytes([1 for x in range(0, 1024*1024)]))
@@ -147,6 +209,57 @@ class TestSocketTransport(unittest.TestCase):
         loop.start(pyev.EVRUN_NOWAIT)
         self.assertEqual(self.data, b'hello')
 
+    def test_counters(self):
+        t = SocketTransport(loop, self.ssock, self.read, self.close)
+        t.start()
+        t.write(b'hello')
+        self.csock.send(b'world!')
+        loop.start(pyev.EVRUN_NOWAIT)
+        totals = {}
+        t.add_counters(totals)
+        self.assertEqual(totals['bytes_written'], 5)
+        self.assertEqual(totals['bytes_read'], 6)
+        self.assertEqual(totals['send_calls'], 1)
+        self.assertEqual(totals['recv_calls'], 1)
+        self.assertEqual(totals['buffered'], 0)
+
+    def test_read_views(self):
+        views = []
+        t = SocketTransport(loop, self.ssock, views.append, self.close,
+                            read_views=True)
+        t.start()
+        self.csock.send(b'hello')
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertTrue(isinstance(views[0], memoryview))
+
+    def test_read_size(self):
+        t = SocketTransport(loop, self.ssock, self.read, self.close)
+        t.start()
+        self.csock.sendall(b'x' * MIN_READ_SIZE * 2)
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(t.read_size, MIN_READ_SIZE * 2)
+
+    def test_read_budget(self):
+        reads = []
+        t = SocketTransport(loop, self.ssock, reads.append, self.close,
+                            read_calls=2)
+        t.start()
+        self.csock.sendall(b'x' * MIN_READ_SIZE * 4)
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(sum(len(r) for r in reads), MIN_READ_SIZE * 3)
+
+    def test_pause_reading(self):
+        t = SocketTransport(loop, self.ssock, self.read, self.close)
+        t.start()
+        t.pause_reading()
+        self.csock.send(b'hello')
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(self.data, [])
+        t.resume_reading()
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(self.data, b'hello')
+
     def test_error(self):
         t = SocketTransport(loop, self.ssock, self.read, self.close)
         self.csock.close()
@@ -154,5 +267,44 @@ class TestSocketTransport(unittest.TestCase):
         loop.start(pyev.EVRUN_NOWAIT)
         self.assertTrue(self.reason is not None)
 
+class TestDatagramTransport(unittest.TestCase):
+    def setUp(self):
+        self.ssock, self.csock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.datagrams = []
+        self.reason = None
+
+    def tearDown(self):
+        self.ssock = None
+        self.csock = None
+        self.datagrams = []
+        self.reason = None
+
+    def read(self, data, address):
+        self.datagrams.append(data)
+
+    def close(self, reason):
+        self.reason = reason
+
+    def test_read(self):
+        t = DatagramTransport(loop, self.ssock, self.read, self.close)
+        t.start()
+        self.csock.send(b'hello')
+        self.csock.send(b'world')
+        loop.start(pyev.EVRUN_NOWAIT)
+        self.assertEqual(self.datagrams, [b'hello', b'world'])
+        self.assertEqual(t.bytes_read, 10)
+
+    def test_write(self):
+        t = DatagramTransport(loop, self.ssock, self.read, self.close)
+        t.write(b'hello')
+        self.assertEqual(self.csock.recv(64), b'hello')
+
+    def test_close(self):
+        t = DatagramTransport(loop, self.ssock, self.read, self.close)
+        t.close()
+        self.assertTrue(t.closed)
+        self.assertTrue(isinstance(self.reason, ConnectionClosed))
+        self.assertRaises(ConnectionClosed, t.write, b'hello')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Tom Burdick <thomas.burdick@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import math
+import pyev
+
+
+class Timeout(object):
+    """A timeout in a TimerWheel.
+
+    Rescheduling to a later deadline only records the new deadline, the
+    timeout is moved when its old slot comes up. Activity that keeps pushing
+    a deadline back therefore costs nothing in the wheel.
+
+    """
+
+    def __init__(self, wheel, callback):
+        """Timeout
+
+        wheel -- the TimerWheel to schedule in
+        callback -- called with no arguments once the deadline passes
+
+        """
+        self.wheel = wheel
+        self.callback = callback
+        self.deadline = None
+        self.slot = None
+        self.expires = None
+
+    def schedule(self, deadline):
+        """Call the callback once the loop time reaches deadline."""
+        self.deadline = deadline
+        if self.slot is None or deadline < self.expires:
+            self.wheel.place(self)
+
+    def cancel(self):
+        """Cancel the timeout if it is scheduled."""
+        self.deadline = None
+        if self.slot is not None:
+            self.wheel.remove(self)
+
+    @property
+    def active(self):
+        return self.slot is not None
+
+
+class TimerWheel(object):
+    """A hierarchical timer wheel for large numbers of coarse timeouts.
+
+    The first level has a slot per tick, each further level has a slot per
+    turn of the level below it. Timeouts are placed in the level their
+    deadline falls in and moved down as the wheel turns, adding and removing
+    one is O(1) and a single pyev timer drives the lot. Deadlines are only
+    kept to within a tick.
+
+    There is one wheel per loop, see for_loop.
+
+    """
+
+    #: wheels by loop
+    wheels = dict()
+
+    @classmethod
+    def for_loop(cls, loop):
+        """Return the wheel for a loop, creating it if needed."""
+        wheel = cls.wheels.get(loop)
+        if wheel is None:
+            wheel = cls.wheels[loop] = cls(loop)
+        return wheel
+
+    def __init__(self, loop, tick=0.25, slots=(256, 64, 64, 64)):
+        """TimerWheel
+
+        loop -- pyev loop
+        tick -- seconds per slot of the first level
+        slots -- number of slots in each level
+
+        """
+        self.loop = loop
+        self.tick = tick
+        self.slots = slots
+        self.spans = [1]
+        for count in slots[:-1]:
+            self.spans.append(self.spans[-1] * count)
+        self.levels = [[set() for x in range(count)] for count in slots]
+        self.origin = self.loop.now()
+        self.ticks = 0
+        self.count = 0
+        self.watcher = pyev.Timer(tick, tick, self.loop, self._tick)
+
+    def timeout(self, callback):
+        """Return a new unscheduled Timeout."""
+        return Timeout(self, callback)
+
+    def place(self, timeout):
+        """Put a timeout in the slot its deadline falls in."""
+        if timeout.slot is not None:
+            timeout.slot.discard(timeout)
+        else:
+            if not self.count:
+                # the wheel stood still while empty, catch it up
+                self.ticks = int((self.loop.now() - self.origin) / self.tick)
+            self.count += 1
+        ticks = int(math.ceil((timeout.deadline - self.origin) / self.tick))
+        ticks = max(ticks, self.ticks + 1)
+        delta = ticks - self.ticks
+        for level, count in enumerate(self.slots):
+            span = self.spans[level]
+            if delta < span * count:
+                break
+        else:
+            ticks = self.ticks + span * (count - 1)
+        timeout.expires = self.origin + ticks * self.tick
+        timeout.slot = self.levels[level][(ticks // span) % count]
+        timeout.slot.add(timeout)
+        if not self.watcher.active:
+            self.watcher.start()
+
+    def remove(self, timeout):
+        """Take a timeout out of the wheel."""
+        timeout.slot.discard(timeout)
+        timeout.slot = None
+        self.count -= 1
+        if not self.count and self.watcher.active:
+            self.watcher.stop()
+
+    def _tick(self, watcher, events):
+        """Called by the pyev watcher (self.watcher) every tick, turns the
+        wheel up to the loop time.
+
+        """
+        target = int((self.loop.now() - self.origin) / self.tick)
+        while self.ticks < target and self.count:
+            self.ticks += 1
+            for level in range(len(self.slots) - 1, 0, -1):
+                span = self.spans[level]
+                if self.ticks % span == 0:
+                    self._cascade(level, (self.ticks // span) % self.slots[level])
+            self._expire(self.levels[0][self.ticks % self.slots[0]])
+        if self.ticks < target:
+            self.ticks = target
+
+    def _cascade(self, level, index):
+        """Move the timeouts of a slot down to the levels below."""
+        slot = self.levels[level][index]
+        self.levels[level][index] = set()
+        for timeout in slot:
+            timeout.slot = None
+            self.count -= 1
+            self.place(timeout)
+
+    def _expire(self, slot):
+        """Call the timeouts of a slot that are due, moving the rest."""
+        now = self.loop.now()
+        for timeout in list(slot):
+            if timeout.slot is not slot:
+                continue
+            if timeout.deadline > now:
+                self.place(timeout)
+            else:
+                self.remove(timeout)
+                timeout.callback()
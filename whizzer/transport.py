@@ -19,10 +19,26 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import os
+import mmap
 import socket
 import errno
+import collections
+import itertools
 import pyev
 
+from whizzer.defer import Deferred
+
+
+#: errno values meaning the socket is simply backed up
+EAGAIN = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+#: maximum number of buffers handed to a single sendmsg call
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16
+
 
 class ConnectionClosed(Exception):
     """Signifies the connection is no longer valid."""
@@ -32,10 +48,251 @@ class BufferOverflowError(Exception):
     """Signifies something would cause a buffer overflow."""
 
 
-class SocketTransport(object):
-    """A buffered writtable transport."""
+#: errno values meaning sendfile can not be used for a file/socket pair
+SENDFILE_UNSUPPORTED = tuple(getattr(errno, name) for name in
+    ('EINVAL', 'ENOSYS', 'ENOTSUP', 'EOPNOTSUPP', 'ENOTSOCK')
+    if hasattr(errno, name))
+
+#: size of the sends done from a memory mapped file
+FILE_CHUNK = 256 * 1024
+
+#: counters kept by every transport, summed up by servers
+COUNTERS = ('bytes_read', 'bytes_written', 'recv_calls', 'send_calls',
+            'eagain', 'buffered')
+
+#: largest datagram a transport will receive
+MAX_DATAGRAM = 65535
+
+#: default number of datagrams received per readable event
+DATAGRAM_BATCH = 64
+
+#: smallest and largest read the transport will ask the socket for
+MIN_READ_SIZE = 4096
+MAX_READ_SIZE = 256 * 1024
+
+#: default write buffer sizes at which writing is paused and resumed
+HIGH_WATER = 64 * 1024
+LOW_WATER = 16 * 1024
+
+#: default limits on the reads done for a single readable event
+READ_CALLS = 16
+READ_BUDGET = 1024 * 1024
+
+
+class BufferPool(object):
+    """A pool of reusable bytearrays keyed by their size.
+
+    A buffer is taken from the pool for the duration of a read and given back
+    afterwards, so nested loop iterations (Deferred.result) never share a
+    buffer that is still in use.
+
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, size):
+        """Take a buffer of the given size from the pool."""
+        free = self.buffers.get(size)
+        if free:
+            return free.pop()
+        return bytearray(size)
+
+    def put(self, buf):
+        """Give a buffer back to the pool."""
+        self.buffers.setdefault(len(buf), []).append(buf)
+
+
+#: read buffers shared by every transport
+read_buffers = BufferPool()
+
+
+class CorkFlusher(object):
+    """Flushes the corked transports of a loop once per loop iteration.
+
+    A single prepare watcher per loop is shared by every corked transport, it
+    is only active while some transport has writes waiting.
+
+    """
+
+    flushers = dict()
+
+    @classmethod
+    def for_loop(cls, loop):
+        """Return the flusher for a loop, creating it if needed."""
+        flusher = cls.flushers.get(loop)
+        if flusher is None:
+            flusher = cls.flushers[loop] = cls(loop)
+        return flusher
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.transports = []
+        self.watcher = pyev.Prepare(self.loop, self._prepare)
+
+    def add(self, transport):
+        """Flush a transport before the loop next waits for events."""
+        self.transports.append(transport)
+        if not self.watcher.active:
+            self.watcher.start()
 
-    def __init__(self, loop, sock, read_cb, close_cb, max_size=1024 * 512):
+    def _prepare(self, watcher, events):
+        """Called by the pyev watcher (self.watcher) before the loop blocks."""
+        transports = self.transports
+        self.transports = []
+        watcher.stop()
+        for transport in transports:
+            transport._uncork()
+
+
+class FileSend(object):
+    """A region of a file queued in a transport write buffer.
+
+    The file is sent with os.sendfile, if that is unavailable or the kernel
+    refuses it for this file and socket the region is memory mapped and sent
+    in chunks instead.
+
+    """
+
+    def __init__(self, fileobj, offset, count, deferred):
+        """FileSend
+
+        fileobj -- file object (anything with a fileno method)
+        offset -- offset in the file to start sending from
+        count -- number of bytes to send
+        deferred -- Deferred given the number of bytes sent when done
+
+        """
+        self.fileobj = fileobj
+        self.offset = offset
+        self.remaining = count
+        self.sent = 0
+        self.calls = 0
+        self.deferred = deferred
+        self.view = None
+        if not hasattr(os, 'sendfile'):
+            self.map()
+
+    def map(self):
+        """Memory map what is left to send."""
+        start = self.offset - self.offset % mmap.ALLOCATIONGRANULARITY
+        region = mmap.mmap(self.fileobj.fileno(),
+                           self.offset - start + self.remaining,
+                           access=mmap.ACCESS_READ, offset=start)
+        self.view = memoryview(region)[self.offset - start:]
+
+    def send(self, sock):
+        """Send as much as the socket will take.
+
+        Returns True once everything has been sent, False if the socket is
+        full. May raise an EnvironmentError with EAGAIN as well.
+
+        """
+        while self.remaining:
+            if self.view is None:
+                size = self.remaining
+                self.calls += 1
+                try:
+                    sent = os.sendfile(sock.fileno(), self.fileobj.fileno(),
+                                       self.offset, size)
+                except EnvironmentError as e:
+                    if e.errno not in SENDFILE_UNSUPPORTED or self.sent:
+                        raise
+                    self.map()
+                    continue
+                if sent == 0:
+                    # the file is shorter than expected
+                    self.remaining = 0
+            else:
+                chunk = self.view[:FILE_CHUNK]
+                size = len(chunk)
+                self.calls += 1
+                sent = sock.send(chunk)
+                self.view = self.view[sent:]
+
+            self.offset += sent
+            self.sent += sent
+            self.remaining -= sent
+            if sent < size:
+                return not self.remaining
+
+        self.view = None
+        return True
+
+
+def _immutable(buf):
+    """Return buf if it is an immutable bytes like object, otherwise an
+    immutable copy of it.
+
+    The write buffer holds on to caller buffers by reference, a buffer the
+    caller may still change underneath us must be copied first.
+
+    """
+    if isinstance(buf, bytes):
+        return buf
+    view = memoryview(buf)
+    if view.readonly and view.itemsize == 1:
+        return view
+    return view.tobytes()
+
+
+class Transport(object):
+    """Counters common to the transports.
+
+    Every counter named in COUNTERS plus peak_buffer, the largest the write
+    buffer has been, is a plain integer attribute.
+
+    """
+
+    __slots__ = COUNTERS + ('peak_buffer',)
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.recv_calls = 0
+        self.send_calls = 0
+        self.eagain = 0
+        self.buffered = 0
+        self.peak_buffer = 0
+
+    def add_counters(self, totals):
+        """Add the counters of this transport to a dict of totals.
+
+        peak_buffer is kept as the largest of the peaks rather than a sum.
+
+        """
+        for name in COUNTERS:
+            totals[name] = totals.get(name, 0) + getattr(self, name)
+        if self.peak_buffer > totals.get('peak_buffer', 0):
+            totals['peak_buffer'] = self.peak_buffer
+
+
+class SocketTransport(Transport):
+    """A buffered writtable transport.
+
+    The write attribute is whichever of unbuffered_write, corked_write or
+    buffered_write suits the state of the transport, callers should simply
+    call write and not care.
+
+    Transports have slots rather than a __dict__ and only create their write
+    watcher once a write is buffered, an idle connection costs little more
+    than its socket and read watcher.
+
+    """
+
+    __slots__ = ('loop', 'sock', 'read_cb', 'close_cb', 'max_size',
+                 'read_views', 'read_size', 'read_calls', 'read_budget',
+                 'high_water', 'low_water', 'pause_cb', 'resume_cb',
+                 'write_paused', 'read_paused', 'started', 'read_watcher',
+                 'write_watcher', 'write_buffer', 'write_buffer_size',
+                 'closed', 'cork', 'corked', 'last_read', 'last_write',
+                 'write')
+
+    def __init__(self, loop, sock, read_cb, close_cb, max_size=1024 * 512,
+                 read_views=False, read_calls=READ_CALLS,
+                 read_budget=READ_BUDGET, high_water=HIGH_WATER,
+                 low_water=LOW_WATER, pause_cb=None, resume_cb=None,
+                 cork=False):
         """Creates a socket transport that will perform the given functions
         whenever the socket is readable or has an error. Writting to the
         transport by default simply calls the send() function and checks for
@@ -43,58 +300,123 @@ class SocketTransport(object):
         (its buffer is full) the write is buffered until the max_size limit is
         reached writting out of the buffer whenever the socket is writtable.
 
+        The write buffer is a queue of the buffers given to write, they are
+        never joined together. Whenever the socket is writtable as many of
+        them as possible are handed to the kernel with a single sendmsg call.
+
+        Reads start at MIN_READ_SIZE and double whenever a read fills the
+        buffer, up to MAX_READ_SIZE, shrinking again when reads come back
+        mostly empty.
+
+        A readable event keeps reading until the socket is drained or either
+        read_calls reads or read_budget bytes have been done, the rest is left
+        for the next loop iteration so other watchers get their turn.
+
+        Once the write buffer grows beyond high_water pause_cb is called, once
+        it has been flushed down to low_water resume_cb is called. Producers
+        that stop writing in between never reach max_size.
+
+        The transport counts what it does, see Transport. last_read and
+        last_write hold the loop time data was last read and sent.
+
+        A corked transport does not send on write, writes made during a loop
+        iteration are gathered and sent together with one sendmsg call just
+        before the loop waits for events again. This saves syscalls and
+        packets for many small writes at the cost of a little latency.
+
         loop -- pyev loop
         sock -- python socket object
         read_cb -- read function (callback when the socket is read)
         close_cb -- closed function (callback when the socket has been closed)
         max_size -- maximum user space buffer
+        read_views -- give read_cb a memoryview of a pooled buffer rather than
+                      bytes, the view is only valid until read_cb returns
+        read_calls -- maximum number of reads per readable event
+        read_budget -- maximum number of bytes read per readable event
+        high_water -- write buffer size after which pause_cb is called
+        low_water -- write buffer size at which resume_cb is called
+        pause_cb -- optional callback when writes should be paused
+        resume_cb -- optional callback when writes may be resumed
+        cork -- gather writes and send them once per loop iteration
 
         """
+        Transport.__init__(self)
         self.loop = loop
         self.sock = sock
         self.read_cb = read_cb
         self.close_cb = close_cb
         self.max_size = max_size
+        self.read_views = read_views
+        self.read_size = MIN_READ_SIZE
+        self.read_calls = read_calls
+        self.read_budget = read_budget
+        self.high_water = high_water
+        self.low_water = low_water
+        self.pause_cb = pause_cb
+        self.resume_cb = resume_cb
+        self.write_paused = False
+        self.read_paused = False
+        self.started = False
         self.sock.setblocking(False)
         self.read_watcher = pyev.Io(self.sock, pyev.EV_READ, self.loop,
                                    self._readable)
-        self.write_watcher = pyev.Io(self.sock, pyev.EV_WRITE, self.loop,
-                                     self._writtable)
-        self.write_buffer = bytearray()
+        self.write_watcher = None
+        self.write_buffer = collections.deque()
+        self.write_buffer_size = 0
         self.closed = False
+        self.cork = cork
+        self.corked = False
+        self.last_read = self.last_write = self.loop.now()
 
-        self.write = self.unbuffered_write
+        if self.cork:
+            self.write = self.corked_write
+        else:
+            self.write = self.unbuffered_write
 
     def start(self):
         """Start watching the socket."""
         if self.closed:
             raise ConnectionClosed()
 
-        self.read_watcher.start()
+        self.started = True
+        if not self.read_paused:
+            self.read_watcher.start()
         if self.write == self.buffered_write:
-            self.write_watcher.start()
+            self._watch_writes()
 
     def stop(self):
         """Stop watching the socket."""
         if self.closed:
             raise ConnectionClosed()
 
+        self.started = False
         if self.read_watcher.active:
             self.read_watcher.stop()
-        if self.write_watcher.active:
+        if self.write_watcher is not None and self.write_watcher.active:
             self.write_watcher.stop()
 
-    def write(self, buf):
-        """Write data to a non-blocking socket.
+    def pause_reading(self):
+        """Stop reading from the socket until resume_reading is called.
 
-        This function is aliased depending on the state of the socket.
+        Incoming data is left in the kernel buffers which in turn pushes back
+        on the other end.
 
-        It may either be unbuffered_write or buffered_write, the caller
-        should not care.
+        """
+        if self.closed:
+            raise ConnectionClosed()
 
-        buf -- bytes to send
+        self.read_paused = True
+        if self.read_watcher.active:
+            self.read_watcher.stop()
 
-        """
+    def resume_reading(self):
+        """Start reading from the socket again."""
+        if self.closed:
+            raise ConnectionClosed()
+
+        self.read_paused = False
+        if self.started and not self.read_watcher.active:
+            self.read_watcher.start()
 
     def unbuffered_write(self, buf):
         """Performs an unbuffered write, the default unless socket.send does
@@ -109,20 +431,69 @@ class SocketTransport(object):
             raise ConnectionClosed()
 
         result = 0
+        self.send_calls += 1
         try:
             result = self.sock.send(buf)
         except EnvironmentError as e:
             # if the socket is simply backed up ignore the error 
-            if e.errno != errno.EAGAIN: 
+            if e.errno not in EAGAIN:
                 self._close(e)
                 return
+            self.eagain += 1
+        self.bytes_written += result
+        self.last_write = self.loop.now()
 
         # when the socket buffers are full/backed up then we need to poll to see
         # when we can write again
         if result != len(buf):
+            self.buffered += 1
             self.write = self.buffered_write
-            self.write_watcher.start()
-            self.write(buf[result:])
+            self._watch_writes()
+            self.write(memoryview(buf)[result:])
+
+    def corked_write(self, buf):
+        """Buffers a write to be sent once the current loop iteration is
+        done, the default for corked transports.
+
+        buf -- bytes to send
+
+        """
+        self.buffered_write(buf)
+        if not self.corked:
+            self.corked = True
+            CorkFlusher.for_loop(self.loop).add(self)
+
+    def sendfile(self, fileobj, offset=0, count=None):
+        """Send part of a file without copying it through python.
+
+        The file is sent after anything already written and before anything
+        written afterwards.
+
+        Returns a Deferred which is given the number of bytes sent once
+        the file has been handed to the kernel.
+
+        fileobj -- file object (anything with a fileno method)
+        offset -- offset in the file to start sending from
+        count -- number of bytes to send, defaults to the rest of the file
+
+        """
+        if self.closed:
+            raise ConnectionClosed()
+
+        if count is None:
+            count = os.fstat(fileobj.fileno()).st_size - offset
+
+        d = Deferred(self.loop)
+        if count <= 0:
+            d.callback(0)
+            return d
+
+        self.write_buffer.append(FileSend(fileobj, offset, count, d))
+        if self.write != self.buffered_write:
+            self.buffered += 1
+            self.write = self.buffered_write
+            self._watch_writes()
+        return d
 
     def buffered_write(self, buf):
         """Appends a bytes like object to the transport write buffer.
@@ -130,34 +501,150 @@ class SocketTransport(object):
         Raises BufferOverflowError if buf would cause the buffer to grow beyond
         the specified maximum.
 
+        Immutable buffers (bytes, read only memoryviews) are kept by reference
+        and not copied.
+
         buf -- bytes to send
 
         """
         if self.closed:
             raise ConnectionClosed()
 
-        if len(buf) + len(self.write_buffer) > self.max_size:
+        buf = _immutable(buf)
+        if len(buf) + self.write_buffer_size > self.max_size:
             raise BufferOverflowError()
-        else:
-            self.write_buffer.extend(buf)
+        elif len(buf):
+            self.write_buffer.append(buf)
+            self.write_buffer_size += len(buf)
+            if self.write_buffer_size > self.peak_buffer:
+                self.peak_buffer = self.write_buffer_size
+            if self.write_buffer_size > self.high_water and not self.write_paused:
+                self.write_paused = True
+                if self.pause_cb:
+                    self.pause_cb()
+
+    def _watch_writes(self):
+        """Start the write watcher, creating it the first time."""
+        if self.write_watcher is None:
+            self.write_watcher = pyev.Io(self.sock, pyev.EV_WRITE, self.loop,
+                                         self._writtable)
+        self.write_watcher.start()
 
     def _writtable(self, watcher, events):
         """Called by the pyev watcher (self.write_watcher) whenever the socket
         is writtable.
 
-        Calls send using the userspace buffer (self.write_buffer) and checks
+        Sends what it can of the userspace buffer (self.write_buffer) and checks
         for errors. If there are no errors then continue on as before.
         Otherwise closes the socket and calls close_cb with the error.
 
         """
         try:
-            sent = self.sock.send(bytes(self.write_buffer))
-            self.write_buffer = self.write_buffer[sent:]
-            if len(self.write_buffer) == 0:
-                self.write_watcher.stop()
+            self._flush()
+        except EnvironmentError as e:
+            if e.errno not in EAGAIN:
+                self._close(e)
+                return
+            self.eagain += 1
+
+        if not self.write_buffer:
+            self.write_watcher.stop()
+            if self.cork:
+                self.write = self.corked_write
+            else:
                 self.write = self.unbuffered_write
+
+        self._check_resume()
+
+    def _uncork(self):
+        """Called by the CorkFlusher to send what has been written during
+        the last loop iteration.
+
+        """
+        self.corked = False
+        if self.closed or self.write == self.buffered_write:
+            return
+
+        try:
+            self._flush()
         except EnvironmentError as e:
-            self._close(e)
+            if e.errno not in EAGAIN:
+                self._close(e)
+                return
+            self.eagain += 1
+
+        if self.write_buffer:
+            self.buffered += 1
+            self.write = self.buffered_write
+            self._watch_writes()
+
+        self._check_resume()
+
+    def _check_resume(self):
+        """Resume writing if the write buffer has drained enough."""
+        if self.write_paused and self.write_buffer_size <= self.low_water:
+            self.write_paused = False
+            if self.resume_cb:
+                self.resume_cb()
+
+    def _flush(self):
+        """Send the write buffer until it is empty or the socket is full.
+
+        Each pass gathers up to IOV_MAX buffers in to one sendmsg call, the
+        cost of a flush depends on how much the socket accepts rather than on
+        how much is buffered.
+
+        """
+        buffers = self.write_buffer
+        while buffers and not self.closed:
+            head = buffers[0]
+            if isinstance(head, FileSend):
+                sent, calls = head.sent, head.calls
+                try:
+                    done = head.send(self.sock)
+                finally:
+                    self.bytes_written += head.sent - sent
+                    self.send_calls += head.calls - calls
+                    if head.sent > sent:
+                        self.last_write = self.loop.now()
+                if not done:
+                    return
+                buffers.popleft()
+                head.deferred.callback(head.sent)
+                continue
+
+            if len(buffers) == 1 or not hasattr(self.sock, 'sendmsg'):
+                batch = None
+            else:
+                batch = list(itertools.takewhile(
+                    lambda buf: not isinstance(buf, FileSend),
+                    itertools.islice(buffers, IOV_MAX)))
+            self.send_calls += 1
+            if batch is None or len(batch) == 1:
+                size = len(head)
+                sent = self.sock.send(head)
+            else:
+                size = sum(len(buf) for buf in batch)
+                sent = self.sock.sendmsg(batch)
+            self.bytes_written += sent
+            if sent:
+                self.last_write = self.loop.now()
+            self._consume(sent)
+            if sent < size:
+                return
+
+    def _consume(self, sent):
+        """Drop sent bytes from the front of the write buffer."""
+        buffers = self.write_buffer
+        self.write_buffer_size -= sent
+        while sent:
+            head = buffers[0]
+            if sent >= len(head):
+                sent -= len(head)
+                buffers.popleft()
+            else:
+                buffers[0] = memoryview(head)[sent:]
+                sent = 0
 
     def _readable(self, watcher, events):
         """Called by the pyev watcher (self.read_watcher) whenever the socket
@@ -167,15 +654,262 @@ class SocketTransport(object):
         is called with the newly arrived bytes. Otherwise closes the socket
         and calls close_cb with the error.
 
+        Reading stops early on a short read as the socket has been drained.
+
         """
-        try:
-            data = self.sock.recv(4096)
-            if len(data) == 0:
+        calls = self.read_calls
+        budget = self.read_budget
+        while (calls > 0 and budget > 0 and not self.closed and
+               not self.read_paused):
+            read_size = self.read_size
+            self.recv_calls += 1
+            try:
+                size = self._recv()
+            except IOError as e:
+                if e.errno not in EAGAIN:
+                    self._close(e)
+                else:
+                    self.eagain += 1
+                return
+
+            if size == 0:
                 self._close(ConnectionClosed())
-            else:
+                return
+
+            self.bytes_read += size
+            self.last_read = self.loop.now()
+            calls -= 1
+            budget -= size
+            if size < read_size:
+                if size < read_size // 4 and read_size > MIN_READ_SIZE:
+                    self.read_size = read_size // 2
+                return
+            elif read_size < MAX_READ_SIZE:
+                self.read_size = read_size * 2
+
+    def _recv(self):
+        """Perform a single read and pass the data on to read_cb.
+
+        Returns the number of bytes read, 0 meaning the other end is gone.
+
+        """
+        if not self.read_views:
+            data = self.sock.recv(self.read_size)
+            if data:
                 self.read_cb(data)
-        except IOError as e:
-            self._close(e)
+            return len(data)
+
+        buf = read_buffers.get(self.read_size)
+        try:
+            size = self.sock.recv_into(buf)
+            if size:
+                self.read_cb(memoryview(buf)[:size])
+            return size
+        finally:
+            read_buffers.put(buf)
+
+    def _close(self, e):
+        """Really close the transport with a reason.
+
+        e -- reason the socket is being closed.
+
+        """
+        self.stop()
+        self.sock.close()
+        self.closed = True
+        for buf in self.write_buffer:
+            if isinstance(buf, FileSend):
+                buf.deferred.errback(e)
+        self.close_cb(e)
+
+    def close(self, reason=ConnectionClosed()):
+        """Close the transport.
+
+        reason -- reason given to close_cb
+
+        """
+        self._close(reason)
+
+
+class DatagramTransport(Transport):
+    """A transport for datagram (udp, unix datagram) sockets."""
+
+    def __init__(self, loop, sock, read_cb, close_cb, error_cb=None,
+                 max_size=1024 * 512, read_views=False,
+                 read_calls=DATAGRAM_BATCH):
+        """Creates a datagram transport calling read_cb with every datagram
+        that arrives.
+
+        A readable event receives datagrams until the socket is drained or
+        read_calls datagrams have been received. Each one is received in to
+        a pooled buffer, only the datagram itself is copied out of it.
+
+        Datagrams are sent straight away, if the socket is full they are
+        queued (up to max_size bytes) and sent whenever it is writtable.
+
+        Errors sending or receiving a single datagram, such as icmp errors
+        or a datagram that is too large, do not close the transport, they are
+        given to error_cb.
+
+        loop -- pyev loop
+        sock -- python socket object
+        read_cb -- callback given (data, address) for every datagram
+        close_cb -- closed function (callback when the socket has been closed)
+        error_cb -- optional callback given non fatal socket errors
+        max_size -- maximum user space buffer
+        read_views -- give read_cb a memoryview of a pooled buffer rather than
+                      bytes, the view is only valid until read_cb returns
+        read_calls -- maximum number of datagrams received per readable event
+
+        """
+        Transport.__init__(self)
+        self.loop = loop
+        self.sock = sock
+        self.read_cb = read_cb
+        self.close_cb = close_cb
+        self.error_cb = error_cb
+        self.max_size = max_size
+        self.read_views = read_views
+        self.read_calls = read_calls
+        self.sock.setblocking(False)
+        self.read_watcher = pyev.Io(self.sock, pyev.EV_READ, self.loop,
+                                    self._readable)
+        self.write_watcher = pyev.Io(self.sock, pyev.EV_WRITE, self.loop,
+                                     self._writtable)
+        self.write_buffer = collections.deque()
+        self.write_buffer_size = 0
+        self.closed = False
+
+    def start(self):
+        """Start watching the socket."""
+        if self.closed:
+            raise ConnectionClosed()
+
+        self.read_watcher.start()
+        if self.write_buffer:
+            self.write_watcher.start()
+
+    def stop(self):
+        """Stop watching the socket."""
+        if self.closed:
+            raise ConnectionClosed()
+
+        if self.read_watcher.active:
+            self.read_watcher.stop()
+        if self.write_watcher.active:
+            self.write_watcher.stop()
+
+    def sendto(self, data, address=None):
+        """Send a datagram.
+
+        Raises BufferOverflowError if the datagram has to be queued and would
+        grow the queue beyond the specified maximum.
+
+        data -- bytes to send
+        address -- destination, None for a connected socket
+
+        """
+        if self.closed:
+            raise ConnectionClosed()
+
+        # anything queued has to go first to keep datagrams in order
+        if self.write_buffer:
+            self._queue(data, address)
+            return
+
+        self.send_calls += 1
+        try:
+            if address is None:
+                self.sock.send(data)
+            else:
+                self.sock.sendto(data, address)
+            self.bytes_written += len(data)
+        except EnvironmentError as e:
+            if e.errno not in EAGAIN:
+                self._error(e)
+                return
+            self.eagain += 1
+            self.buffered += 1
+            self._queue(data, address)
+            self.write_watcher.start()
+
+    def write(self, data):
+        """Send a datagram on a connected socket."""
+        self.sendto(data)
+
+    def _queue(self, data, address):
+        """Queue a datagram to be sent once the socket is writtable."""
+        data = _immutable(data)
+        if len(data) + self.write_buffer_size > self.max_size:
+            raise BufferOverflowError()
+        self.write_buffer.append((data, address))
+        self.write_buffer_size += len(data)
+        if self.write_buffer_size > self.peak_buffer:
+            self.peak_buffer = self.write_buffer_size
+
+    def _writtable(self, watcher, events):
+        """Called by the pyev watcher (self.write_watcher) whenever the socket
+        is writtable.
+
+        Sends queued datagrams until the queue is empty or the socket is full.
+
+        """
+        buffers = self.write_buffer
+        while buffers and not self.closed:
+            data, address = buffers[0]
+            self.send_calls += 1
+            try:
+                if address is None:
+                    self.sock.send(data)
+                else:
+                    self.sock.sendto(data, address)
+                self.bytes_written += len(data)
+            except EnvironmentError as e:
+                if e.errno in EAGAIN:
+                    self.eagain += 1
+                    return
+                self._error(e)
+            buffers.popleft()
+            self.write_buffer_size -= len(data)
+
+        if not self.closed:
+            self.write_watcher.stop()
+
+    def _readable(self, watcher, events):
+        """Called by the pyev watcher (self.read_watcher) whenever the socket
+        is readable.
+
+        Receives datagrams, calling read_cb for each, until the socket is
+        drained or read_calls datagrams have been received.
+
+        """
+        calls = self.read_calls
+        buf = read_buffers.get(MAX_DATAGRAM)
+        try:
+            while calls > 0 and not self.closed:
+                self.recv_calls += 1
+                try:
+                    size, address = self.sock.recvfrom_into(buf)
+                except EnvironmentError as e:
+                    if e.errno in EAGAIN:
+                        self.eagain += 1
+                    else:
+                        self._error(e)
+                    return
+
+                calls -= 1
+                self.bytes_read += size
+                if self.read_views:
+                    self.read_cb(memoryview(buf)[:size], address)
+                else:
+                    self.read_cb(memoryview(buf)[:size].tobytes(), address)
+        finally:
+            read_buffers.put(buf)
+
+    def _error(self, e):
+        """Hand a non fatal error to error_cb."""
+        if self.error_cb:
+            self.error_cb(e)
 
     def _close(self, e):
         """Really close the transport with a reason.